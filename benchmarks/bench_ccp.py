@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Copyright (C) 2018 MrKrabat
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+'''
+Measures latency and throughput of CCPConnection against the local stub server.
+
+python3 benchmarks/bench_ccp.py [--parser bs4|stream] [--phases] [--profile FILE] [records ...]
+'''
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import fixtures
+import netcup
+from netcup.metrics import CCPMetrics, PHASES, profileCall
+from stubserver import CCPStubServer
+
+
+def bench(func, min_time=1.0, min_runs=3):
+    """
+    Returns list of seconds per call
+    """
+
+    timings = []
+    start = time.perf_counter()
+    while len(timings) < min_runs or time.perf_counter() - start < min_time:
+        begin = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - begin)
+
+    return timings
+
+
+def report(name, size, timings):
+    """
+    Prints latency and throughput
+    """
+
+    timings.sort()
+    median = timings[len(timings) // 2]
+    print("%-14s %8s %6d %10.2f %10.2f %10.1f" % (name, size, len(timings), median * 1000, timings[-1] * 1000, len(timings) / sum(timings)))
+
+
+if __name__ == "__main__":
+    args = argparse.ArgumentParser(description="CCPConnection benchmark")
+    args.add_argument("--parser", default="bs4", choices=netcup.ccp.PARSERS)
+    args.add_argument("--time", type=float, default=1.0, help="minimum seconds per benchmark")
+    args.add_argument("--phases", action="store_true", help="print mean milliseconds per request phase")
+    args.add_argument("--profile", metavar="FILE", help="dump cProfile stats of one getDomain of the largest zone")
+    args.add_argument("sizes", type=int, nargs="*", default=[10, 100, 1000, 10000])
+    args = args.parse_args()
+
+    server = CCPStubServer().start()
+    for size in args.sizes:
+        server.addZone(size, "zone%d.example.org" % size, fixtures.records(size))
+
+    print("%-14s %8s %6s %10s %10s %10s" % ("call", "records", "runs", "p50 ms", "max ms", "ops/s"))
+
+    # login of new connection
+    def login():
+        ccp = netcup.CCPConnection(url=server.url)
+        ccp.start(server.username, server.password)
+        ccp.close()
+    report("start", "-", bench(login, args.time))
+
+    metrics = CCPMetrics()
+    ccp = netcup.CCPConnection(url=server.url, parser=args.parser, observers=[metrics])
+    ccp.start(server.username, server.password)
+    report("getDomainList", "-", bench(lambda: ccp.getDomainList(), args.time))
+
+    for size in args.sizes:
+        report("getDomain", size, bench(lambda: ccp.getDomain(size), args.time))
+
+        # change one record per save
+        mydomain = ccp.getDomain(size)
+        rr_id = next(iter(mydomain.getAllRecords()))
+        def save(minimal=False):
+            mydomain.setRecord(rr_id, rr_destination="192.0.2.%d" % (time.perf_counter_ns() % 250))
+            ccp.saveDomain(mydomain, minimal=minimal)
+        report("saveDomain", size, bench(save, args.time))
+        report("saveDomain min", size, bench(lambda: save(True), args.time))
+
+    if args.profile:
+        profileCall(ccp.getDomain, max(args.sizes), output=args.profile)
+
+    ccp.close()
+    print(ccp.getStats())
+
+    if args.phases:
+        print("\n%-36s %8s" % ("action", "requests") + "".join("%10s" % phase for phase in PHASES))
+        for action, totals in sorted(metrics.getStats().items()):
+            print("%-36s %8d" % (action, totals["requests"]) + "".join("%10.2f" % (totals["phases"][phase] * 1000 / totals["requests"]) for phase in PHASES))
+    server.stop()
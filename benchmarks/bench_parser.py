@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Copyright (C) 2018 MrKrabat
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+'''
+Measures records per second of the getDomain zone parsers.
+
+python3 benchmarks/bench_parser.py [records ...]
+'''
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import fixtures
+from netcup.zoneparser import parseDomain, PARSERS
+
+
+def bench(content, domain_id, parser, min_time=1.0):
+    """
+    Returns seconds per parse
+    """
+
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        parseDomain(content, domain_id, parser)
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / runs
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10, 100, 1000, 10000]
+
+    print("%8s %8s %12s %14s" % ("records", "parser", "ms/parse", "records/s"))
+    for size in sizes:
+        content = fixtures.load("showdomainsdetails_%d.html" % size,
+                                lambda: fixtures.showdomainsdetails(1234, "example.org", fixtures.records(size)))
+
+        # parsers have to return same records
+        results = [parseDomain(content, 1234, parser).getAllRecords() for parser in PARSERS]
+        if any(result != results[0] for result in results):
+            raise SystemExit("Parsers returned different records")
+
+        for parser in PARSERS:
+            seconds = bench(content, 1234, parser)
+            print("%8d %8s %12.2f %14.0f" % (size, parser, seconds * 1000, size / seconds))
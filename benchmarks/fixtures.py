@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Copyright (C) 2018 MrKrabat
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+'''
+Synthetic CCP pages following the structure of recorded responses.
+'''
+
+import os
+from html import escape
+
+
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+RR_TYPES = ["A", "AAAA", "MX", "TXT", "CNAME", "SRV", "NS", "DS", "TLSA", "CAA", "SSHFP", "SMIMEA", "OPENPGPKEY"]
+TOKENS = """<script type="text/javascript">
+    var sessionhash = "%s";
+    var nocsrftoken = "%s";
+</script>
+"""
+
+
+def records(count):
+    """
+    Returns list of count synthetic records
+    """
+
+    ret = []
+    for i in range(count):
+        rr_type = ("A", "AAAA", "TXT", "MX", "CNAME")[i % 5]
+        if rr_type == "A":
+            destination = "10.%d.%d.%d" % (i >> 16 & 255, i >> 8 & 255, i & 255)
+        elif rr_type == "AAAA":
+            destination = "2001:db8::%x" % i
+        elif rr_type == "TXT":
+            destination = "v=spf1 include:_spf.example.org ~all %d" % i
+        elif rr_type == "MX":
+            destination = "mx%d.example.org" % i
+        else:
+            destination = "target%d.example.org" % i
+        ret.append((str(1000000 + i), "host%d" % (i // 5), rr_type, "10" if rr_type == "MX" else "0", destination))
+
+    return ret
+
+
+def showdomainsdetails(domain_id, domain_name, rr_list, serial="2018010101", webhosting=False, live=True,
+                       sessionhash="0123456789abcdef", nocsrftoken="fedcba9876543210"):
+    """
+    Returns showdomainsdetails page, tokens are left out if None
+    """
+
+    domain_id = str(domain_id)
+    html = [TOKENS % (sessionhash, nocsrftoken) if sessionhash and nocsrftoken else "",
+            '<div id="domainsdetail_detail_dns_%s" class="tab">' % domain_id,
+            '<form id="dnsform_%s" method="post">' % domain_id,
+            '<input type="hidden" name="zone" value="%s">' % domain_name,
+            '<input type="hidden" name="zoneid" value="%s">' % (int(domain_id) * 7),
+            '<input type="hidden" name="serial" value="%s">' % serial,
+            '<table class="zone_settings">',
+            '<tr><td>TTL</td><td><input type="text" name="zone_settings_ttl_%s" value="86400"></td></tr>' % domain_id,
+            '<tr><td>Retry</td><td><input type="text" name="zone_settings_retry_%s" value="7200"></td></tr>' % domain_id,
+            '<tr><td>Expire</td><td><input type="text" name="zone_settings_expire_%s" value="1209600"></td></tr>' % domain_id,
+            '<tr><td>Refresh</td><td><input type="text" name="zone_settings_refresh_%s" value="28800"></td></tr>' % domain_id,
+            '<tr><td>DNSSEC</td><td><input type="checkbox" id="dnssecenabled_%s" name="dnssecenabled" checked="checked"></td></tr>' % domain_id,
+            '</table>',
+            '<table class="zone_records">',
+            '<tr><th>Host</th><th>Typ</th><th>MX</th><th>Ziel</th><th>L&ouml;schen</th></tr>']
+
+    # resource records
+    for rr_id, rr_host, rr_type, rr_pri, rr_destination in rr_list:
+        html.append(__row("record[" + rr_id + "]", rr_host, rr_type, rr_pri, rr_destination))
+
+    # webhosting rows
+    if webhosting:
+        html.append('<tr><td colspan="5"><label id="restoredefaultslabel_%s">Standardeintr&auml;ge</label></td></tr>' % domain_id)
+        html.append('<tr><td colspan="5"><input type="checkbox" name="restoredefaults_%s" value="true"></td></tr>' % domain_id)
+
+    # new entry and submit rows
+    html.append(__row("new[0]", "", "A", "", ""))
+    html.append('<tr><td colspan="5"><input type="submit" name="submit" value="DNS Records speichern"></td></tr>')
+    html.append('</table>')
+    html.append('<table class="zone_status"><tr><td>Aktuell</td><td>%s</td></tr></table>' % ("yes" if live else "no"))
+    html.append('</form>')
+    html.append('</div>')
+
+    return "\n".join(html)
+
+
+def __row(name, rr_host, rr_type, rr_pri, rr_destination):
+    """
+    Returns table row of one record
+    """
+
+    options = "".join('<option value="%s"%s>%s</option>' % (value, ' selected="selected"' if value == rr_type else "", value) for value in RR_TYPES)
+    return ('<tr><td><input type="text" name="%s[host]" value="%s"></td>' % (name, escape(rr_host)) +
+            '<td><select name="%s[type]">%s</select></td>' % (name, options) +
+            '<td><input type="text" name="%s[pri]" value="%s"></td>' % (name, escape(rr_pri)) +
+            '<td><input type="text" name="%s[destination]" value="%s"></td>' % (name, escape(rr_destination)) +
+            '<td><input type="checkbox" name="%s[delete]"></td></tr>' % name)
+
+
+def load(name, generate):
+    """
+    Returns saved fixture, generates and saves it if missing
+    """
+
+    path = os.path.join(FIXTURE_PATH, name)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except IOError:
+        content = generate()
+        os.makedirs(FIXTURE_PATH, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return content
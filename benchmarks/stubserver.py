@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Copyright (C) 2018 MrKrabat
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+'''
+Local stand-in for the CCP replaying gzip compressed pages.
+
+python3 benchmarks/stubserver.py [port]
+'''
+
+import gzip
+import time
+import secrets
+import threading
+from urllib.parse import urlsplit, parse_qs, parse_qsl
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import fixtures
+
+
+PAGE_SIZE = 10
+
+
+class CCPStubZone(object):
+    """
+    Zone served by stub server
+    """
+
+    def __init__(self, domain_id, domain_name, rr_list, webhosting=False, live_delay=0):
+        """
+        Creates zone from list of (id, host, type, pri, destination)
+
+        Saved changes are live after live_delay seconds
+        """
+
+        self.lock       = threading.Lock()
+        self.domain_id  = str(domain_id)
+        self.name       = domain_name
+        self.serial     = 2018010101
+        self.webhosting = webhosting
+        self.live       = True
+        self.live_delay = live_delay
+        self.liveat     = 0
+        self.records    = {rr_id: (rr_host, rr_type, rr_pri, rr_destination) for rr_id, rr_host, rr_type, rr_pri, rr_destination in rr_list}
+        self.nextid     = 9000000
+        self.__page     = None
+
+
+    def page(self, sessionhash, nocsrftoken):
+        """
+        Returns gzip compressed showdomainsdetails page
+        """
+
+        with self.lock:
+            live = self.live and time.monotonic() >= self.liveat
+            if self.__page is None or self.__page[0] != (self.serial, live, sessionhash, nocsrftoken):
+                rr_list = [(rr_id,) + value for rr_id, value in self.records.items()]
+                content = fixtures.showdomainsdetails(self.domain_id, self.name, rr_list, serial=str(self.serial),
+                                                      webhosting=self.webhosting, live=live,
+                                                      sessionhash=sessionhash, nocsrftoken=nocsrftoken)
+                self.__page = ((self.serial, live, sessionhash, nocsrftoken), gzip.compress(content.encode("utf-8"), 1))
+
+            return self.__page[1]
+
+
+    def edit(self, form):
+        """
+        Applies posted editzone form, returns False on serial conflict
+        """
+
+        with self.lock:
+            if form.get("serial") != str(self.serial):
+                return False
+
+            # group fields by record key
+            records = {}
+            for key, value in form.items():
+                if key.endswith("]") and "][" in key:
+                    rr_key, field = key[:-1].rsplit("[", 1)
+                    records.setdefault(rr_key, {})[field] = value
+
+            for rr_key, fields in records.items():
+                if "delete" in fields:
+                    self.records.pop(rr_key[7:-1], None)
+                elif rr_key.startswith("new["):
+                    self.records[str(self.nextid)] = (fields.get("host", ""), fields.get("type", ""), fields.get("pri", "0"), fields.get("destination", ""))
+                    self.nextid += 1
+                elif rr_key.startswith("record["):
+                    self.records[rr_key[7:-1]] = (fields.get("host", ""), fields.get("type", ""), fields.get("pri", "0"), fields.get("destination", ""))
+
+            self.serial += 1
+            self.liveat = time.monotonic() + self.live_delay
+            return True
+
+
+class CCPStubServer(ThreadingHTTPServer):
+    """
+    HTTP/1.1 keep-alive server answering like the CCP
+    """
+
+    daemon_threads = True
+
+    def __init__(self, username="user", password="password", port=0, ajax_tokens=True):
+        """
+        Creates server on localhost, port 0 selects free port
+        """
+
+        super().__init__(("127.0.0.1", port), CCPStubHandler)
+        self.username    = username
+        self.password    = password
+        self.ajax_tokens = ajax_tokens
+        self.zones       = {}
+        self.sessions    = {}
+        self.lock        = threading.Lock()
+        self.counter     = {}
+        self.url         = "http://127.0.0.1:%d/run/" % self.server_port
+
+
+    def addZone(self, domain_id, domain_name, rr_list, webhosting=False, live_delay=0):
+        """
+        Adds zone to server
+        """
+
+        self.zones[str(domain_id)] = CCPStubZone(domain_id, domain_name, rr_list, webhosting, live_delay)
+        return self.zones[str(domain_id)]
+
+
+    def start(self):
+        """
+        Serves requests in background thread
+        """
+
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+
+    def stop(self):
+        """
+        Stops server
+        """
+
+        self.shutdown()
+        self.server_close()
+
+
+    def count(self, name):
+        """
+        Counts request by name
+        """
+
+        with self.lock:
+            self.counter[name] = self.counter.get(name, 0) + 1
+
+
+class CCPStubHandler(BaseHTTPRequestHandler):
+    """
+    Request handler of CCPStubServer
+    """
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        """
+        Disables request logging
+        """
+
+        pass
+
+
+    def do_GET(self):
+        """
+        Handles GET requests
+        """
+
+        self.__dispatch({})
+
+
+    def do_POST(self):
+        """
+        Handles POST requests
+        """
+
+        length = int(self.headers.get("Content-Length", 0))
+        form = dict(parse_qsl(self.rfile.read(length).decode("utf-8"), keep_blank_values=True))
+        self.__dispatch(form)
+
+
+    def __dispatch(self, form):
+        """
+        Routes request to page
+        """
+
+        url = urlsplit(self.path)
+        query = {key: value[0] for key, value in parse_qs(url.query, keep_blank_values=True).items()}
+        page = url.path.rsplit("/", 1)[-1]
+        action = query.get("action", form.get("action", ""))
+        self.server.count(page + ("?" + action if action else ""))
+
+        session = self.__session()
+        if page == "start.php":
+            self.__login(form)
+        elif page == "logout.php":
+            self.__logout()
+        elif page == "domains.php":
+            if session:
+                self.__send(self.__tokens(session) + "<div id=\"header\">Angemeldet als " + self.server.username + "</div>")
+            else:
+                self.__send("<form id=\"login\" action=\"start.php\"></form>")
+        elif not session or query.get("sessionhash") != session[0]:
+            self.__send("Your session has expired")
+        elif page == "nocrfs_ajax.php":
+            self.__send(session[1])
+        elif page == "domains_ajax.php" and action == "listdomains":
+            self.__listDomains(session, query)
+        elif page == "domains_ajax.php" and action == "showdomainsdetails":
+            zone = self.server.zones.get(query.get("domain_id"))
+            if zone:
+                self.__send(zone.page(*session) if self.server.ajax_tokens else zone.page(None, None), compressed=True)
+            else:
+                self.__send("<div>Domain nicht gefunden</div>")
+        elif page == "domains_ajax.php" and action == "editzone":
+            zone = self.server.zones.get(query.get("domain_id"))
+            if zone and zone.edit(form):
+                self.__send(self.__ajaxTokens(session) + "<div>Eintrag erfolgreich!</div><input type=\"hidden\" name=\"serial\" value=\"" + str(zone.serial) + "\">")
+            else:
+                self.__send(self.__ajaxTokens(session) + "<div>Fehler beim Speichern</div>")
+        else:
+            self.send_error(404)
+
+
+    def __session(self):
+        """
+        Returns tokens of session cookie
+        """
+
+        cookies = self.headers.get("Cookie", "")
+        for cookie in cookies.split(";"):
+            name, _, value = cookie.strip().partition("=")
+            if name == "PHPSESSID":
+                return self.server.sessions.get(value)
+
+        return None
+
+
+    def __login(self, form):
+        """
+        Checks login form and creates session
+        """
+
+        if form.get("ccp_user") == self.server.username and form.get("ccp_password") == self.server.password:
+            sid = secrets.token_hex(16)
+            self.server.sessions[sid] = (secrets.token_hex(16), secrets.token_hex(16))
+            self.__send(self.__tokens(self.server.sessions[sid]) + "<div id=\"header\">Angemeldet als " + self.server.username + "</div>",
+                        cookie="PHPSESSID=" + sid + "; Path=/")
+        else:
+            self.__send("<div class=\"error\">Login fehlgeschlagen</div>")
+
+
+    def __logout(self):
+        """
+        Removes session
+        """
+
+        cookies = self.headers.get("Cookie", "")
+        for cookie in cookies.split(";"):
+            name, _, value = cookie.strip().partition("=")
+            if name == "PHPSESSID":
+                self.server.sessions.pop(value, None)
+        self.__send("<div>Abgemeldet</div>")
+
+
+    def __listDomains(self, session, query):
+        """
+        Returns one page of domain list
+        """
+
+        search = query.get("suchstrg", "")
+        page = int(query.get("seite", 1))
+        zones = [zone for zone in self.server.zones.values() if search in zone.name]
+        if not zones:
+            self.__send(self.__ajaxTokens(session) + "<div>Sie haben keine Domains gebucht</div>")
+            return
+
+        # ccp repeats last page if page is too high
+        pages = (len(zones) + PAGE_SIZE - 1) // PAGE_SIZE
+        page = min(max(page, 1), pages)
+        rows = ["<tr><td>" + zone.name + " </td><td><a href=\"#\" onclick=\"showDomainsDetails(" + zone.domain_id + ");\">Details</a></td></tr>"
+                for zone in zones[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]]
+        self.__send(self.__ajaxTokens(session) + "<table>" + "".join(rows) + "</table>")
+
+
+    def __tokens(self, session):
+        """
+        Returns javascript containing tokens
+        """
+
+        return fixtures.TOKENS % session
+
+
+    def __ajaxTokens(self, session):
+        """
+        Returns tokens if ajax responses contain them
+        """
+
+        return self.__tokens(session) if self.server.ajax_tokens else ""
+
+
+    def __send(self, content, compressed=False, cookie=None):
+        """
+        Sends gzip compressed response
+        """
+
+        body = content if compressed else gzip.compress(content.encode("utf-8"), 1)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=UTF-8")
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        if cookie:
+            self.send_header("Set-Cookie", cookie)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+if __name__ == "__main__":
+    import sys
+
+    server = CCPStubServer(port=int(sys.argv[1]) if len(sys.argv) > 1 else 8080)
+    for size in (10, 100, 1000, 10000):
+        server.addZone(size, "zone%d.example.org" % size, fixtures.records(size))
+
+    print("Serving " + server.url + " (user/password)")
+    server.serve_forever()
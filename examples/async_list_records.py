@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Copyright (C) 2018 MrKrabat
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import asyncio
+
+import netcup
+
+
+async def main():
+    # connect to cpp, max 16 requests at the same time
+    ccp = netcup.AsyncCCPConnection(cachepath="mysession", concurrency=16)
+    await ccp.start(username = "<CCP LOGIN>",
+                    password = "<CCP PASSWORD>")
+
+    # get all domains at once
+    domains = await asyncio.gather(*[ccp.getDomain(key) for key in (await ccp.getDomainList()).keys()])
+
+    # print all records of every domain
+    for mydomain in domains:
+        for key, value in mydomain.getAllRecords().items():
+            print(mydomain.getDomainName() + ": " + value["host"] + " - " + value["type"] + " - " + value["destination"])
+
+    # cleanup
+    await ccp.close()
+
+
+asyncio.run(main())
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Copyright (C) 2018 MrKrabat
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import netcup
+
+
+# connect to cpp
+ccp = netcup.CCPConnection(cachepath="mysession")
+ccp.start(username = "<CCP LOGIN>",
+          password = "<CCP PASSWORD>")
+
+# get domain infos
+mydomain = ccp.getDomain("<DOMAIN ID>")
+
+# apply all changes or none of them
+mydomain.applyChanges([("add",    {"rr_host": "demo", "rr_type": "A", "rr_destination": "127.0.0.1"}),
+                       ("add",    {"rr_host": "demo", "rr_type": "AAAA", "rr_destination": "::1"}),
+                       ("set",    {"rr_id": "<RR ID>", "rr_destination": "127.0.0.2"}),
+                       ("remove", {"rr_id": "<OTHER RR ID>"})])
+
+# same using batch, changes are rolled back on exception
+with mydomain.batch():
+    for key, value in mydomain.searchRecord(rr_host="old", rr_type="A").items():
+        mydomain.removeRecord(key)
+    mydomain.addRecord(rr_host="new", rr_type="A", rr_destination="127.0.0.3")
+
+# print changes and save them in one request
+print(mydomain.getChanges())
+ccp.saveDomain(mydomain)
+
+# cleanup
+ccp.close()
@@ -8,7 +8,6 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 import os
-import time
 
 import netcup
 
@@ -20,7 +19,7 @@ certbot certonly --manual --preferred-challenges=dns --manual-auth-hook authenti
 - Paths to the hooks have to be absolute
 - Wildcard certificates require certbot 0.22
 - Wildcard certificates requere ACMEv2, add argument --server https://acme-v02.api.letsencrypt.org/directory
-- It takes approximately 10 minutes per domain for verifying
+- It takes up to 10 minutes per domain for verifying, checking the nameservers directly requires dnspython
 - Will only work if all domains in CSR are from one netcup account
 '''
 
@@ -66,13 +65,14 @@ if __name__ == "__main__":
     # save changes
     ccp.saveDomain(mydomain)
 
-    # wait for changes to take effect
-    timer = time.time() + 15*60
-    while True:
-        time.sleep(60)
-        # check if settings are live or timeout reached
-        if ccp.isRecordLive(DOMAIN_ID) or time.time() > timer:
-            break
+    # wait up to 15 minutes for changes to take effect, records are checked
+    # on the authoritative nameservers too if dnspython is installed
+    try:
+        import dns
+        records = {DOMAIN_ID: [(DOMAIN_HOST + "." + DOMAIN_NAME, "TXT", CERTBOT_VALIDATION)]}
+    except ImportError:
+        records = None
+    ccp.waitForLive([DOMAIN_ID], timeout=15*60, records=records)
 
     # cleanup
     ccp.close()
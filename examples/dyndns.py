@@ -7,23 +7,44 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
+import sys
+import signal
+import threading
+from functools import partial
+
 import netcup
+from netcup.dyndns import CCPDynDNS, publicAddress
 
+'''
+python3 dyndns.py          runs as daemon, checks addresses every minute
+python3 dyndns.py --once   updates changed records once, e.g. from cron
+'''
 
-# connect to cpp
-ccp = netcup.CCPConnection(cachepath="mysession")
+# connect to cpp, the zone cache avoids downloading unchanged zones
+ccp = netcup.CCPConnection(cachepath="mysession", zonecache=netcup.CCPZoneCache(), relogin=1)
 ccp.start(username = "<CCP LOGIN>",
           password = "<CCP PASSWORD>")
 
-# get domain infos
-mydomain = ccp.getDomain("<DOMAIN ID>")
-
-# update record
-mydomain.setRecord(rr_id          = "<RR ID>",
-                   rr_destination = "<NEW IPv4>")
-
-# save changes
-ccp.saveDomain(mydomain)
+# records to keep up to date, IPv4 behind NAT needs the public address
+daemon = CCPDynDNS(ccp, interval=60, debounce=5)
+ipv4 = partial(publicAddress, "https://api.ipify.org")
+daemon.addHost("<DOMAIN ID>", "home", "A", ipv4)
+daemon.addHost("<DOMAIN ID>", "nas",  "A", ipv4)
+daemon.addHost("<DOMAIN ID>", "home", "AAAA")
+
+if "--once" in sys.argv:
+    daemon.runOnce(force=True)
+else:
+    # run until SIGINT or SIGTERM
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    daemon.start()
+    ccp.startKeepAlive()
+    try:
+        stop.wait()
+    except KeyboardInterrupt:
+        pass
+    daemon.stop()
 
 # cleanup
 ccp.close()
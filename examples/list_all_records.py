@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Copyright (C) 2018 MrKrabat
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import netcup
+
+
+# connect to cpp, keep one connection per worker alive
+ccp = netcup.CCPConnection(cachepath="mysession", pool_size=8)
+ccp.start(username = "<CCP LOGIN>",
+          password = "<CCP PASSWORD>")
+
+# fetch all domains in parallel
+for domain_id, mydomain, error in ccp.getDomains(ccp.getDomainList().keys(), max_workers=8):
+    # print failed domains
+    if error:
+        print(domain_id + ": " + str(error))
+        continue
+
+    # print all records and keys
+    for key, value in mydomain.getAllRecords().items():
+        print(mydomain.getDomainName() + ": " + key + " - " + value["host"] + " - " + value["type"] + " - " + value["destination"])
+
+# cleanup
+ccp.close()
@@ -15,8 +15,8 @@ ccp = netcup.CCPConnection(cachepath="mysession")
 ccp.start(username = "<CCP LOGIN>",
           password = "<CCP PASSWORD>")
 
-# print all domains and keys
-for key, value in ccp.getDomainList().items():
+# print all domains and keys of all pages
+for key, value in ccp.iterDomains():
     print(key + ": " + value)
 
 # cleanup
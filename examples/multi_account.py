@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Copyright (C) 2018 MrKrabat
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import netcup
+
+
+# all accounts share one connection pool
+manager = netcup.CCPManager(pool_size=16, max_workers=8)
+manager.addAccount("reseller1", username="<CCP LOGIN 1>", password="<CCP PASSWORD 1>", cachepath="mysession1")
+manager.addAccount("reseller2", username="<CCP LOGIN 2>", password="<CCP PASSWORD 2>", cachepath="mysession2")
+
+# optional: login all accounts in parallel instead of on first use
+for name, error in manager.login().items():
+    if error:
+        print(name + ": " + str(error))
+
+# domain is looked up in all accounts
+mydomain = manager.getDomain("example.org")
+mydomain.addRecord(rr_host        = "demo",
+                   rr_type        = "A",
+                   rr_destination = "127.0.0.1")
+manager.saveDomain(mydomain)
+
+# cleanup
+manager.close()
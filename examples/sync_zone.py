@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Copyright (C) 2018 MrKrabat
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import netcup
+
+
+# desired records as (host, type, destination, pri)
+RECORDS = [("@",    "A",    "127.0.0.1"),
+           ("www",  "CNAME", "@"),
+           ("@",    "MX",   "mail.example.org", 10),
+           ("@",    "TXT",  "v=spf1 mx -all")]
+
+# connect to cpp
+ccp = netcup.CCPConnection(cachepath="mysession", parser="stream")
+ccp.start(username = "<CCP LOGIN>",
+          password = "<CCP PASSWORD>")
+
+# show planned changes
+plan = ccp.syncZone("<DOMAIN ID>", RECORDS, dry_run=True)
+for key, value in plan["remove"].items():
+    print("- " + key + ": " + value["host"] + " - " + value["type"] + " - " + value["destination"])
+for value in plan["add"]:
+    print("+ " + value["host"] + " - " + value["type"] + " - " + value["destination"])
+
+# apply changes with one fetch and one save
+ccp.syncZone("<DOMAIN ID>", RECORDS)
+
+# cleanup
+ccp.close()
@@ -13,7 +13,21 @@ This package contains a python3 API for netcup dns settings.
 
 try:
     from ccp import CCPConnection
+    from transport import CCPTransport
+    from aio import AsyncCCPConnection
+    from cache import CCPZoneCache
+    from record import CCPRecord
+    from manager import CCPManager
+    from metrics import CCPObserver, CCPMetrics
+    from ratelimit import CCPRateLimiter, CCPConcurrencyLimit
     from exception import *
 except ImportError:
     from .ccp import CCPConnection
+    from .transport import CCPTransport
+    from .aio import AsyncCCPConnection
+    from .cache import CCPZoneCache
+    from .record import CCPRecord
+    from .manager import CCPManager
+    from .metrics import CCPObserver, CCPMetrics
+    from .ratelimit import CCPRateLimiter, CCPConcurrencyLimit
     from .exception import *
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Copyright (C) 2018 MrKrabat
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import asyncio
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from ccp import CCPConnection
+except ImportError:
+    from .ccp import CCPConnection
+
+
+class AsyncCCPConnection(object):
+    """
+    Netcup CCP API for asyncio
+    """
+
+    def __init__(self, cachepath=None, concurrency=8, **kwargs):
+        """
+        Creates asyncio CCP connection
+
+        All coroutines share one session and cookie jar, at most concurrency
+        requests are running at the same time
+        """
+
+        # check concurrency
+        if concurrency < 1:
+            raise ValueError("concurrency has to be positive integer")
+
+        kwargs.setdefault("pool_size", concurrency)
+        self.__ccp = CCPConnection(cachepath=cachepath, **kwargs)
+        self.__concurrency = concurrency
+        self.__semaphore = None
+        self.__executor = ThreadPoolExecutor(max_workers=concurrency)
+
+
+    async def start(self, username, password, token_2FA=None):
+        """
+        Performs login if session is invalid
+        """
+
+        return await self.__run(self.__ccp.start, username, password, token_2FA)
+
+
+    async def close(self):
+        """
+        Save session or perform logout
+        """
+
+        try:
+            return await self.__run(self.__ccp.close)
+        finally:
+            self.__executor.shutdown(wait=False)
+
+
+    async def getDomainList(self, search="", page=1):
+        """
+        Returns dict containing domain id and name
+        """
+
+        return await self.__run(self.__ccp.getDomainList, search, page)
+
+
+    async def getDomain(self, domain_id):
+        """
+        Return Domain object
+        """
+
+        return await self.__run(self.__ccp.getDomain, domain_id)
+
+
+    async def saveDomain(self, domain_obj):
+        """
+        Saves domain object on netcup
+        """
+
+        return await self.__run(self.__ccp.saveDomain, domain_obj)
+
+
+    async def isRecordLive(self, domain_id):
+        """
+        Checks if domain dns records are live
+        """
+
+        return await self.__run(self.__ccp.isRecordLive, domain_id)
+
+
+    async def waitForLive(self, domain_ids, timeout=900, **kwargs):
+        """
+        Waits until dns records of all domains are live
+        """
+
+        return await self.__run(partial(self.__ccp.waitForLive, domain_ids, timeout, **kwargs))
+
+
+    def getConnection(self):
+        """
+        Returns underlying blocking CCPConnection
+        """
+
+        return self.__ccp
+
+
+    async def __run(self, func, *args):
+        """
+        Runs blocking call in executor limited by semaphore
+        """
+
+        # semaphore has to be created inside running event loop
+        if self.__semaphore is None:
+            self.__semaphore = asyncio.Semaphore(self.__concurrency)
+
+        async with self.__semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.__executor, partial(func, *args))
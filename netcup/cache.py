@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Copyright (C) 2018 MrKrabat
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import copy
+import time
+import threading
+from collections import OrderedDict
+
+
+class CCPZoneCache(object):
+    """
+    LRU cache of Domain objects with time to live
+    """
+
+    def __init__(self, maxsize=128, ttl=300):
+        """
+        Creates cache holding up to maxsize domains for ttl seconds
+        """
+
+        # check arguments
+        if maxsize < 1:
+            raise ValueError("maxsize has to be positive integer")
+        if ttl < 0:
+            raise ValueError("ttl has to be positive number")
+
+        self.__maxsize = maxsize
+        self.__ttl     = ttl
+        self.__lock    = threading.Lock()
+        self.__entries = OrderedDict()
+        self.__stats   = {"hits":        0,
+                          "misses":      0,
+                          "revalidated": 0,
+                          "evictions":   0}
+
+
+    def get(self, domain_id):
+        """
+        Returns tuple of copy of cached Domain object and True if not expired
+
+        Returns (None, False) if domain is not cached
+        """
+
+        domain_id = str(domain_id)
+        with self.__lock:
+            entry = self.__entries.get(domain_id)
+            if entry is None:
+                self.__stats["misses"] += 1
+                return None, False
+
+            self.__entries.move_to_end(domain_id)
+            fresh = time.monotonic() - entry[0] <= self.__ttl
+            if fresh:
+                self.__stats["hits"] += 1
+            domain_obj = entry[1]
+
+        return copy.deepcopy(domain_obj), fresh
+
+
+    def put(self, domain_obj):
+        """
+        Stores copy of Domain object
+        """
+
+        domain_id = domain_obj.getDomainID()
+        domain_obj = copy.deepcopy(domain_obj)
+        with self.__lock:
+            self.__entries[domain_id] = (time.monotonic(), domain_obj)
+            self.__entries.move_to_end(domain_id)
+
+            # remove least recently used domains
+            while len(self.__entries) > self.__maxsize:
+                self.__entries.popitem(last=False)
+                self.__stats["evictions"] += 1
+
+        return True
+
+
+    def revalidate(self, domain_id):
+        """
+        Restarts time to live of unchanged domain
+        """
+
+        domain_id = str(domain_id)
+        with self.__lock:
+            entry = self.__entries.get(domain_id)
+            if entry is None:
+                return False
+
+            self.__entries[domain_id] = (time.monotonic(), entry[1])
+            self.__stats["revalidated"] += 1
+
+        return True
+
+
+    def invalidate(self, domain_id):
+        """
+        Removes domain from cache
+        """
+
+        with self.__lock:
+            return self.__entries.pop(str(domain_id), None) is not None
+
+
+    def clear(self):
+        """
+        Removes all domains from cache
+        """
+
+        with self.__lock:
+            self.__entries.clear()
+
+
+    def getStats(self):
+        """
+        Returns dict containing cache counters
+        """
+
+        with self.__lock:
+            stats = dict(self.__stats)
+            stats["size"] = len(self.__entries)
+
+        return stats
@@ -7,68 +7,134 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
-import os
-from re import search, findall
-from bs4 import BeautifulSoup
-from gzip import decompress
+import time
+import logging
+import threading
+from re import findall
+from codecs import getincrementaldecoder
 from base64 import b64encode
-from urllib.parse import urlencode, quote_plus
-from urllib.request import build_opener, HTTPCookieProcessor
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlencode, quote_plus, urlsplit, parse_qs
 from http.cookiejar import LWPCookieJar
 
 try:
     from domain import CCPDomain
+    from sync import diffRecords, applyPlan
+    from zoneparser import parseDomain, parseSerial, CCPZoneParser, PARSERS
+    from propagation import CCPPropagationChecker
+    from metrics import PHASES
+    from transport import CCPTransport
+    from tokens import CCPTokenStore, CCPTokenScanner
+    from session import CCPSessionStore
     from exception import *
 except ImportError:
     from .domain import CCPDomain
+    from .sync import diffRecords, applyPlan
+    from .zoneparser import parseDomain, parseSerial, CCPZoneParser, PARSERS
+    from .propagation import CCPPropagationChecker
+    from .metrics import PHASES
+    from .transport import CCPTransport
+    from .tokens import CCPTokenStore, CCPTokenScanner
+    from .session import CCPSessionStore
     from .exception import *
 
 
+CCP_URL = "https://ccp.netcup.net/run/"
+
+logger = logging.getLogger(__name__)
+
+
 class CCPConnection(object):
     """
     Netcup CCP API
+
+    A logged in connection is thread-safe, methods like getDomain can be
+    called concurrently from a ThreadPoolExecutor. Tokens are stored in a
+    lock-protected CCPTokenStore and only one thread refreshes the csrf
+    token at a time.
     """
 
-    def __init__(self, cachepath=None):
+    def __init__(self, cachepath=None, transport=None, pool_size=4, idle_timeout=60, timeout=30, parser="bs4", url=CCP_URL,
+                 zonecache=None, relogin=0, session_probe="light", session_trust=0, observers=None, ratelimit=None):
         """
         Creates CCP connection
+
+        transport can be shared between connections, otherwise a new
+        keep-alive connection pool is created using pool_size, idle_timeout
+        and timeout (in seconds). parser selects the zone parser used by
+        getDomain, "bs4" or the faster single pass "stream" parser. url is
+        the base url of the CCP. zonecache is an optional CCPZoneCache used
+        by getDomain. relogin is the number of times getDomainList, getDomain
+        and isRecordLive log in again and retry after CCPSessionExpired.
+
+        With cachepath, session_probe "light" validates the cached session
+        using the small csrf token request, "full" by downloading
+        domains.php. A session validated less than session_trust seconds
+        ago is used without any request.
+
+        observers is a list of CCPObserver getting timings of every request
+        and session events. ratelimit is an optional CCPRateLimiter all
+        requests wait for.
         """
-        self.__cache = False
-        self.__sessionhash = None
-        self.__nocsrftoken = None
 
-        # creates urllib with custom headers and cookie management
+        # check if session probe exists
+        if session_probe not in ("light", "full"):
+            raise ValueError("session_probe has to be light or full")
+
+        # check if parser exists
+        if parser not in PARSERS:
+            raise ValueError("Unknown parser, use one of " + ", ".join(PARSERS))
+
+        self.__parser = parser
+        self.__url = url
+        self.__zonecache = zonecache
+        self.__cache = False
+        self.__session = None
+        self.__sessioninfo = {}
+        self.__expired = None
+        self.__probe = session_probe
+        self.__trust = session_trust
+        self.__tokens = CCPTokenStore()
+        self.__relogin = int(relogin)
+        self.__credentials = None
+        self.__reloginlock = threading.Lock()
+        self.__keepalive = None
+        self.__observers = list(observers or [])
+        self.__ratelimit = ratelimit
+        self.__statslock = threading.Lock()
+        self.__stats = {"relogins":         0,
+                        "keepalives":       0,
+                        "keepalive_errors": 0}
+
+        # creates keep-alive transport with custom headers and cookie management
         self.__jar = LWPCookieJar()
-        self.__network = build_opener(HTTPCookieProcessor(self.__jar))
+        self.__owntransport = transport is None
+        if transport is None:
+            transport = CCPTransport(pool_size=pool_size, idle_timeout=idle_timeout, timeout=timeout)
+        self.__network = transport
         self.__network.addheaders = [("User-Agent",      "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36 Edge/16.16299"),
-                                     ("Accept-Encoding", "gzip, deflate, br"),
+                                     ("Accept-Encoding", "gzip, deflate"),
                                      ("Accept",          "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8")]
 
-        # load session cache from disk
+        # session cache on disk is loaded by start
         if cachepath:
-            # check if path is writeable
-            path = os.path.dirname(cachepath)
-            if not path:
-                path = "."
-
-            if not os.access(path, os.W_OK):
-                raise IOError("cachepath is not writeable")
-
             self.__cache = True
-            self.__cachepath = cachepath
-            # load cookies
-            try:
-                self.__jar.load(cachepath, ignore_discard=True)
-            except IOError:
-                # cookie file does not exist
-                pass
+            self.__session = CCPSessionStore(cachepath)
 
 
     def start(self, username, password, token_2FA=None):
         """
         Performs login if session is invalid
+
+        token_2FA can be a callable returning the current token, it is
+        required to log in again automatically on 2FA accounts
         """
 
+        # remember credentials for relogin
+        self.__credentials = (username, password, token_2FA)
+        if callable(token_2FA):
+            token_2FA = token_2FA()
+
         # check if arguments are strings
         if not isinstance(username, str):
             username = str(username)
@@ -77,49 +143,18 @@ class CCPConnection(object):
         if token_2FA and not isinstance(token_2FA, str):
             token_2FA = str(token_2FA)
 
-        # validate cached session
+        # share one login between processes using the same cachepath
         if self.__cache:
-            resource = self.__network.open("https://ccp.netcup.net/run/domains.php")
-            content = decompress(resource.read()).decode(resource.headers.get_content_charset())
-            if username in content:
-                self.__getTokens(content)
-                return True
-
-        # create login post
-        payload = {"action":       "login",
-                   "nocsrftoken":  "",
-                   "ccp_user":     username,
-                   "ccp_password": password,
-                   "language":     "DE",
-                   "login":        "Login / Anmelden"}
-
-        # 2FA Auth
-        if token_2FA:
-            payload.pop("ccp_password", False)
-            payload["pwdb64"] = b64encode(password.encode("ascii"))
-            payload["tan"]    = token_2FA
-
-        # send login
-        payload = urlencode(payload)
-        resource = self.__network.open("https://ccp.netcup.net/run/start.php", payload.encode("utf-8"))
-        content = decompress(resource.read()).decode(resource.headers.get_content_charset())
-
-        # check if login successful
-        if username in content:
-            resource = self.__network.open("https://ccp.netcup.net/run/domains.php")
-            content = decompress(resource.read()).decode(resource.headers.get_content_charset())
-            self.__getTokens(content)
-
-            # check tokens
-            if not self.__sessionhash or not self.__nocsrftoken:
-                if token_2FA:
-                    raise CCPLoginError("2FA token invalid")
-                else:
-                    raise CCPLoginError("Your account has 2FA enabled")
+            with self.__session.lock():
+                # load session saved by other processes
+                self.__sessioninfo = self.__session.load(self.__jar)
+                if not self.__validateSession(username):
+                    self.__login(username, password, token_2FA)
+                self.__session.save(self.__jar, self.__sessioninfo)
 
             return True
-        else:
-            raise CCPLoginError("Login failed check your credentials")
+
+        return self.__login(username, password, token_2FA)
 
 
     def close(self):
@@ -127,14 +162,74 @@ class CCPConnection(object):
         Save session or perform logout
         """
 
+        self.stopKeepAlive()
+
         # check if caching is enabled
         if self.__cache:
-            # save session
-            self.__jar.save(self.__cachepath, ignore_discard=True)
+            # save session unless other process saved a newer one
+            with self.__session.lock():
+                if self.__session.loadInfo().get("validated", 0) <= self.__sessioninfo.get("validated", 0):
+                    _, sessionhash, nocsrftoken = self.__tokens.get()
+                    if self.__sessioninfo:
+                        self.__sessioninfo.update(sessionhash=sessionhash, nocsrftoken=nocsrftoken)
+                    self.__session.save(self.__jar, self.__sessioninfo)
         else:
             # logout
-            resource = self.__network.open("https://ccp.netcup.net/run/logout.php")
-            content = decompress(resource.read()).decode(resource.headers.get_content_charset())
+            self.__request(self.__url + "logout.php")
+
+        # close idle connections
+        if self.__owntransport:
+            self.__network.close()
+
+
+    def startKeepAlive(self, interval=300):
+        """
+        Refreshes session every interval seconds in background thread
+
+        Expired sessions are logged in again if relogin is enabled
+        """
+
+        self.stopKeepAlive()
+        stop = threading.Event()
+        thread = threading.Thread(target=self.__keepAlive, args=(stop, interval), daemon=True)
+        self.__keepalive = (stop, thread)
+        thread.start()
+        return True
+
+
+    def stopKeepAlive(self):
+        """
+        Stops background session refresh
+        """
+
+        if self.__keepalive is None:
+            return False
+
+        stop, thread = self.__keepalive
+        self.__keepalive = None
+        stop.set()
+        if thread is not threading.current_thread():
+            thread.join()
+
+        return True
+
+
+    def addObserver(self, observer):
+        """
+        Adds CCPObserver
+        """
+
+        self.__observers = self.__observers + [observer]
+        return True
+
+
+    def removeObserver(self, observer):
+        """
+        Removes CCPObserver
+        """
+
+        self.__observers = [item for item in self.__observers if item is not observer]
+        return True
 
 
     def getDomainList(self, search="", page=1):
@@ -142,10 +237,18 @@ class CCPConnection(object):
         Returns dict containing domain id and name
         """
 
+        return self.__retry(self.__getDomainList, search, page)
+
+
+    def __getDomainList(self, search, page):
+        """
+        Requests one page of domain list
+        """
+
         # get domain list
-        resource = self.__network.open("https://ccp.netcup.net/run/domains_ajax.php?suchstrg=" + quote_plus(search) + "&action=listdomains&seite=" + str(page) + "&sessionhash=" + self.__sessionhash + "&nocsrftoken=" + self.__nocsrftoken)
-        content = decompress(resource.read()).decode(resource.headers.get_content_charset())
-        self.__getTokens(content)
+        ticket, sessionhash, nocsrftoken = self.__tokens.get()
+        content = self.__request(self.__url + "domains_ajax.php?suchstrg=" + quote_plus(search) + "&action=listdomains&seite=" + str(page) + "&sessionhash=" + sessionhash + "&nocsrftoken=" + nocsrftoken)
+        self.__getTokens(content, ticket)
 
         # check if domains found
         if "Es wurden keine Domains zu ihrer Suche nach" in content or "Sie haben keine Domains gebucht" in content:
@@ -166,72 +269,164 @@ class CCPConnection(object):
         return dict(zip(domain_id, domain_name))
 
 
+    def iterDomains(self, search="", prefetch=True):
+        """
+        Yields tuple of domain id and name of all pages
+
+        The first page defines the page size, a shorter page, an empty page
+        or a page without unseen domains ends the listing. With prefetch the
+        next page is requested in background while the current one is
+        consumed.
+        """
+
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        seen = set()
+        page = 1
+        pagesize = None
+        try:
+            current = self.getDomainList(search, page)
+            while current:
+                # ccp repeats last page if page number is too high
+                domains = [(key, value) for key, value in current.items() if key not in seen]
+                if not domains:
+                    break
+
+                if pagesize is None:
+                    pagesize = len(current)
+                last = len(current) < pagesize
+
+                # request next page while current is consumed
+                nextpage = None
+                if not last and executor:
+                    nextpage = executor.submit(self.getDomainList, search, page + 1)
+
+                for key, value in domains:
+                    seen.add(key)
+                    yield key, value
+
+                if last:
+                    break
+
+                page += 1
+                current = nextpage.result() if nextpage else self.getDomainList(search, page)
+        finally:
+            if executor:
+                executor.shutdown(wait=False)
+
+
     def getDomain(self, domain_id):
         """
         Return Domain object
+
+        With zonecache a cached domain is returned until its ttl expires,
+        afterwards it is reused without parsing if the serial is unchanged
         """
 
-        # get domain info
-        resource = self.__network.open("https://ccp.netcup.net/run/domains_ajax.php?domain_id=" + str(domain_id) + "&action=showdomainsdetails&sessionhash=" + self.__sessionhash + "&nocsrftoken=" + self.__nocsrftoken)
-        content = decompress(resource.read()).decode(resource.headers.get_content_charset())
-        self.__getTokens(content)
+        return self.__retry(self.__getDomain, domain_id)
 
-        # parse html
-        soup = BeautifulSoup(content, "html.parser")
-        div = soup.find("div", {"id": "domainsdetail_detail_dns_" + str(domain_id)})
-        if not div:
-            raise CCPWebsiteChanges("Could not get DNS tab")
 
-        table = div.find_all("table")
-        if not table:
-            raise CCPWebsiteChanges("Could not get RR table")
+    def __getDomain(self, domain_id):
+        """
+        Requests and parses domain
+        """
+
+        # check zone cache
+        cached = None
+        if self.__zonecache:
+            cached, fresh = self.__zonecache.get(domain_id)
+            if fresh:
+                return cached
 
-        # create CCPDomain object
-        try:
-            webhosting = True if "restoredefaultslabel_" + str(domain_id) in str(div) else False
-            dnssec = True if "checked" in str(div.find("input", {"id": "dnssecenabled_" + str(domain_id)})) else None
-            domain_obj = CCPDomain(domain_id         = domain_id,
-                                   domain_name       = div.find("input", {"name": "zone"}).get("value"),
-                                   domain_zone       = div.find("input", {"name": "zoneid"}).get("value"),
-                                   domain_serial     = div.find("input", {"name": "serial"}).get("value"),
-                                   domain_dnssec     = dnssec,
-                                   domain_webhosting = webhosting,
-                                   domain_ttl        = div.find("input", {"name": "zone_settings_ttl_" + str(domain_id)}).get("value"),
-                                   domain_retry      = div.find("input", {"name": "zone_settings_retry_" + str(domain_id)}).get("value"),
-                                   domain_expire     = div.find("input", {"name": "zone_settings_expire_" + str(domain_id)}).get("value"),
-                                   domain_refresh    = div.find("input", {"name": "zone_settings_refresh_" + str(domain_id)}).get("value"))
-        except (AttributeError, TypeError) as e:
-            raise CCPWebsiteChanges("Could not get domain infos")
-
-        # for every dns entry
-        del_lines = -2 if not webhosting else -4
-        for row in table[-2].find_all("tr")[1:del_lines]:
-            column = row.find_all("td")
-
-            # get values
+        # get domain info
+        ticket, sessionhash, nocsrftoken = self.__tokens.get()
+        url = self.__url + "domains_ajax.php?domain_id=" + str(domain_id) + "&action=showdomainsdetails&sessionhash=" + sessionhash + "&nocsrftoken=" + nocsrftoken
+        event = self.__newEvent(url)
+        chunks = self.__scanTokens(self.__stream(url, event=event, emit=False), ticket)
+
+        if self.__parser == "stream":
+            # parse html while downloading
+            zone = CCPZoneParser(domain_id)
+            unchanged = False
+            try:
+                for chunk in chunks:
+                    # serial unchanged, only read remaining content
+                    if unchanged:
+                        continue
+
+                    zone.feed(chunk)
+                    if cached and zone.getSerial() is not None:
+                        unchanged = zone.getSerial() == cached.getDomainSerial()
+                        cached = cached if unchanged else None
+
+                if not unchanged:
+                    start = time.perf_counter()
+                    domain_obj = zone.getDomain()
+                    event["parse"] += time.perf_counter() - start
+            finally:
+                self.__emit(event)
+
+            # keep cached object
+            if unchanged:
+                self.__zonecache.revalidate(domain_id)
+                return cached
+        else:
+            start = None
             try:
-                rr_host = column[0].input.get("value")
-                rr_pri = column[2].input.get("value")
-                rr_destination = column[3].input.get("value")
-                rr_type = ""
-
-                for option in column[1].find_all("option"):
-                    if option.get("selected"):
-                        rr_type = option.get("value")
-                        break
-            except (AttributeError, TypeError, KeyError) as e:
-                raise CCPWebsiteChanges("Could not get RR row")
-
-            # if record contain values
-            if rr_host:
-                domain_obj.addRecord(rr_host, rr_type, rr_destination, rr_pri, column[0].input.get("name")[:-6])
+                content = "".join(chunks)
+                start = time.perf_counter()
+
+                # serial unchanged, skip parsing
+                if cached and parseSerial(content) == cached.getDomainSerial():
+                    self.__zonecache.revalidate(domain_id)
+                    return cached
+
+                # parse html
+                domain_obj = parseDomain(content, domain_id, self.__parser)
+            finally:
+                if start is not None:
+                    event["parse"] += time.perf_counter() - start
+                self.__emit(event)
+
+        if self.__zonecache:
+            self.__zonecache.put(domain_obj)
 
         return domain_obj
 
 
-    def saveDomain(self, domain_obj):
+    def getDomains(self, domain_ids, max_workers=4):
+        """
+        Yields tuple of domain id, Domain object and exception
+
+        Domains are fetched in parallel and yielded as they finish. A failed
+        domain is yielded with Domain object None and the raised exception
+        instead of stopping the whole batch.
+        """
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        futures = {executor.submit(self.getDomain, domain_id): domain_id for domain_id in domain_ids}
+        try:
+            for future in as_completed(futures):
+                # any error of one zone, e.g. unsupported records
+                try:
+                    result = (futures[future], future.result(), None)
+                except Exception as e:
+                    result = (futures[future], None, e)
+                yield result
+        finally:
+            # stop pending requests if generator is closed early
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+
+    def saveDomain(self, domain_obj, minimal=False):
         """
         Saves domain object on netcup
+
+        With minimal only added, modified and deleted records are sent
+        instead of the whole zone. Warning: it is not verified how the CCP
+        handles records missing in the form, if it deletes them a minimal
+        save removes all unchanged records of the zone.
         """
 
         # check if domain_obj is CCPDomain
@@ -243,103 +438,499 @@ class CCPConnection(object):
             return True
 
         # create post payload
-        payload = {"zone":          domain_obj.getDomainName(),
-                   "zoneid":        domain_obj.getDomainZone(),
-                   "serial":        domain_obj.getDomainSerial(),
-                   "order":         "",
-                   "formchanged":   "",
-                   "zone_settings_ttl_"     + domain_obj.getDomainID(): domain_obj.getTTL(),
-                   "zone_settings_expire_"  + domain_obj.getDomainID(): domain_obj.getExpire(),
-                   "zone_settings_retry_"   + domain_obj.getDomainID(): domain_obj.getRetry(),
-                   "zone_settings_refresh_" + domain_obj.getDomainID(): domain_obj.getRefresh(),
-                   "restoredefaults_"       + domain_obj.getDomainID(): "false",
-                   "submit":        "DNS Records speichern"}
+        start = time.perf_counter()
+        payload = [("zone",          domain_obj.getDomainName()),
+                   ("zoneid",        domain_obj.getDomainZone()),
+                   ("serial",        domain_obj.getDomainSerial()),
+                   ("order",         ""),
+                   ("formchanged",   ""),
+                   ("zone_settings_ttl_"     + domain_obj.getDomainID(), domain_obj.getTTL()),
+                   ("zone_settings_expire_"  + domain_obj.getDomainID(), domain_obj.getExpire()),
+                   ("zone_settings_retry_"   + domain_obj.getDomainID(), domain_obj.getRetry()),
+                   ("zone_settings_refresh_" + domain_obj.getDomainID(), domain_obj.getRefresh()),
+                   ("restoredefaults_"       + domain_obj.getDomainID(), "false"),
+                   ("submit",        "DNS Records speichern")]
 
         # set dnssec state
         if isinstance(domain_obj.getDNSSEC(), bool):
-            payload["dnssecenabled"] = str(not domain_obj.getDNSSEC()).lower()
+            payload.append(("dnssecenabled", str(not domain_obj.getDNSSEC()).lower()))
 
         # add dns records to payload
-        for key, value in domain_obj.getAllRecords().items():
+        for key, value in domain_obj.iterRecords(changed_only=minimal):
             try:
-                payload[key + "[host]"] = value["host"]
-                payload[key + "[type]"] = value["type"]
-                payload[key + "[pri]"]  = value["pri"]
-                payload[key + "[destination]"] = value["destination"]
+                payload.append((key + "[host]", value["host"]))
+                payload.append((key + "[type]", value["type"]))
+                payload.append((key + "[pri]",  value["pri"]))
+                payload.append((key + "[destination]", value["destination"]))
                 if "delete" in value:
-                    payload[key + "[delete]"] = value["delete"]
+                    payload.append((key + "[delete]", value["delete"]))
             except KeyError:
                 raise ValueError("Invalid CCPDomain object")
 
         # send update
-        payload = urlencode(payload)
-        resource = self.__network.open("https://ccp.netcup.net/run/domains_ajax.php?action=editzone&domain_id=" + domain_obj.getDomainID() + "&sessionhash=" + self.__sessionhash + "&nocsrftoken=" + self.__nocsrftoken,
-                                      payload.encode("utf-8"))
-        content = decompress(resource.read()).decode(resource.headers.get_content_charset())
-        self.__getTokens(content)
+        payload = urlencode(payload).encode("utf-8")
+        ticket, sessionhash, nocsrftoken = self.__tokens.get()
+        url = self.__url + "domains_ajax.php?action=editzone&domain_id=" + domain_obj.getDomainID() + "&sessionhash=" + sessionhash + "&nocsrftoken=" + nocsrftoken
+        event = self.__newEvent(url, payload)
+        event["encode"] = time.perf_counter() - start
+        content = self.__request(url, payload, event)
+        self.__getTokens(content, ticket)
+
+        # cached domain is outdated
+        if self.__zonecache:
+            self.__zonecache.invalidate(domain_obj.getDomainID())
 
         # check if update was successful
         if not "Eintrag erfolgreich!" in content:
             raise CCPSaveDomainError("Could not save domain")
 
-        # parse html
-        soup = BeautifulSoup(content, "html.parser")
-        try:
-            # update domain serial
-            domain_obj.setDomainSerial(soup.find("input", {"name": "serial"}).get("value"))
-        except (AttributeError, TypeError) as e:
+        # update domain serial
+        serial = parseSerial(content)
+        if serial is None:
             raise CCPWebsiteChanges("Could not get domain serial")
 
+        domain_obj.setDomainSerial(serial)
+        domain_obj.clearChanges()
         return True
 
 
+    def syncZone(self, domain_id, desired_records, dry_run=False, managed_types=None, minimal=False):
+        """
+        Makes records of domain equal to desired records, returns plan
+
+        Fetches and saves domain once. desired_records is an iterable of
+        dicts or tuples of host, type, destination and optional pri, see
+        diffRecords. With dry_run the plan is returned without changes.
+        minimal is passed to saveDomain, see its warning.
+        """
+
+        domain_obj = self.getDomain(domain_id)
+        plan = diffRecords(domain_obj, desired_records, managed_types)
+        if dry_run or (not plan["add"] and not plan["remove"]):
+            return plan
+
+        applyPlan(domain_obj, plan)
+        self.saveDomain(domain_obj, minimal=minimal)
+        return plan
+
+
     def isRecordLive(self, domain_id):
         """
         Checks if domain dns records are live
         """
 
+        return self.__retry(self.__isRecordLive, domain_id)
+
+
+    def __isRecordLive(self, domain_id):
+        """
+        Requests live state of domain
+        """
+
         # get domain info
-        resource = self.__network.open("https://ccp.netcup.net/run/domains_ajax.php?domain_id=" + str(domain_id) + "&action=showdomainsdetails&sessionhash=" + self.__sessionhash + "&nocsrftoken=" + self.__nocsrftoken)
-        content = decompress(resource.read()).decode(resource.headers.get_content_charset())
-        self.__getTokens(content)
+        ticket, sessionhash, nocsrftoken = self.__tokens.get()
+        chunks = self.__scanTokens(self.__stream(self.__url + "domains_ajax.php?domain_id=" + str(domain_id) + "&action=showdomainsdetails&sessionhash=" + sessionhash + "&nocsrftoken=" + nocsrftoken), ticket)
+
+        # search zone state without keeping the page
+        live = False
+        tail = ""
+        for chunk in chunks:
+            if not live and "<td>yes</td>" in tail + chunk:
+                live = True
+            tail = chunk[-11:]
+
+        return live
+
+
+    def waitForLive(self, domain_ids, timeout=900, interval=5, max_interval=60, records=None, max_workers=4):
+        """
+        Waits until dns records of all domains are live
+
+        One poller checks all pending domains per round, the pause between
+        rounds starts at interval and grows up to max_interval. records can
+        map domain id to list of tuples of fully qualified name, type and
+        destination, these domains are also live once all authoritative
+        nameservers answer the records (requires dnspython). A domain whose
+        check fails is not live in that round. Returns dict of domain id
+        and live state after timeout seconds at most.
+        """
+
+        pending = [str(domain_id) for domain_id in domain_ids]
+        state = dict.fromkeys(pending, False)
+        records = {str(domain_id): value for domain_id, value in (records or {}).items()}
+        checker = CCPPropagationChecker() if records else None
+
+        def check(domain_id):
+            try:
+                if checker is not None and domain_id in records and checker.isLive(records[domain_id]):
+                    return True
+                return self.isRecordLive(domain_id)
+            except (CCPError, OSError):
+                # failed check is retried next round
+                return False
+
+        deadline = time.monotonic() + timeout
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending)))) as executor:
+            while pending:
+                # check all pending domains at once
+                for domain_id, live in zip(pending, executor.map(check, pending)):
+                    state[domain_id] = live
+                pending = [domain_id for domain_id in pending if not state[domain_id]]
+
+                remaining = deadline - time.monotonic()
+                if not pending or remaining <= 0:
+                    break
+
+                time.sleep(min(interval, remaining))
+                interval = min(interval * 1.5, max_interval)
+
+        return state
+
+
+    def getStats(self):
+        """
+        Returns dict containing connection statistics
+        """
+
+        stats = self.__network.getStats()
+        with self.__statslock:
+            stats.update(self.__stats)
+        for key, value in self.__tokens.getStats().items():
+            stats["token_" + key] = value
+        if self.__ratelimit is not None:
+            for key, value in self.__ratelimit.getStats().items():
+                stats["ratelimit_" + key] = value
+        if self.__zonecache:
+            for key, value in self.__zonecache.getStats().items():
+                stats["zonecache_" + key] = value
+
+        return stats
+
+
+    def __login(self, username, password, token_2FA):
+        """
+        Performs login
+        """
+
+        # create login post
+        payload = {"action":       "login",
+                   "nocsrftoken":  "",
+                   "ccp_user":     username,
+                   "ccp_password": password,
+                   "language":     "DE",
+                   "login":        "Login / Anmelden"}
+
+        # 2FA Auth
+        if token_2FA:
+            payload.pop("ccp_password", False)
+            payload["pwdb64"] = b64encode(password.encode("ascii"))
+            payload["tan"]    = token_2FA
+
+        # send login
+        payload = urlencode(payload)
+        content = self.__request(self.__url + "start.php", payload.encode("utf-8"))
+
+        # check if login successful
+        if username in content:
+            # use tokens of login page if available
+            if not "sessionhash = " in content:
+                content = self.__request(self.__url + "domains.php")
+            self.__getTokens(content)
 
-        if "<td>yes</td>" in content:
+            # check tokens
+            _, sessionhash, nocsrftoken = self.__tokens.get()
+            if not sessionhash or not nocsrftoken:
+                if token_2FA:
+                    raise CCPLoginError("2FA token invalid")
+                else:
+                    raise CCPLoginError("Your account has 2FA enabled")
+
+            self.__validated(username)
+            self.__notify("onSession", {"kind": "login"})
             return True
         else:
+            raise CCPLoginError("Login failed check your credentials")
+
+
+    def __validateSession(self, username):
+        """
+        Returns True if cached session is valid and loads its tokens
+        """
+
+        # no cookies cached or cached session known to be expired
+        if not len(self.__jar) or (self.__expired is not None and self.__sessioninfo.get("sessionhash") == self.__expired):
             return False
 
+        info = self.__sessioninfo
+        if info.get("username") == username and info.get("sessionhash") and info.get("nocsrftoken"):
+            # trust recently validated session
+            if self.__trust and time.time() - info.get("validated", 0) <= self.__trust:
+                self.__tokens.update(None, info["sessionhash"], info["nocsrftoken"])
+                return True
+
+            # request new csrf token using cached session hash
+            if self.__probe == "light":
+                try:
+                    nocsrftoken = self.__getNewCSRF(info["sessionhash"]).strip()
+                except CCPSessionExpired:
+                    return False
+
+                if nocsrftoken and len(nocsrftoken) < 256 and not "<" in nocsrftoken:
+                    self.__tokens.update(None, info["sessionhash"], nocsrftoken)
+                    self.__validated(username)
+                    return True
+
+        # check if domains page shows username
+        content = self.__request(self.__url + "domains.php")
+        if username in content:
+            self.__getTokens(content)
+            self.__validated(username)
+            return True
+
+        return False
 
-    def __getTokens(self, html):
+
+    def __validated(self, username):
         """
-        Retrieves session and csrf token
+        Remembers successful session validation
         """
 
-        # check session
-        if "Your session has expired" in html:
-            raise CCPSessionExpired("CCP session expired")
+        _, sessionhash, nocsrftoken = self.__tokens.get()
+        self.__sessioninfo = {"username":    username,
+                              "sessionhash": sessionhash,
+                              "nocsrftoken": nocsrftoken,
+                              "validated":   time.time()}
+
+
+    def __retry(self, func, *args):
+        """
+        Calls idempotent func, logs in again on expired session
+        """
+
+        attempts = 0
+        while True:
+            sessionhash = self.__tokens.getSessionHash()
+            try:
+                return func(*args)
+            except CCPSessionExpired:
+                if attempts >= self.__relogin or self.__credentials is None:
+                    raise
+                attempts += 1
+                self.__notify("onRetry", {"call": func.__name__.lstrip("_"), "attempt": attempts, "error": "session expired"})
+                self.__reauthenticate(sessionhash)
+
+
+    def __reauthenticate(self, sessionhash):
+        """
+        Performs new login once for all threads using expired session
+        """
+
+        with self.__reloginlock:
+            # other thread already logged in again
+            if self.__tokens.getSessionHash() != sessionhash:
+                return False
+
+            self.__jar.clear()
+            self.__expired = sessionhash
+            self.start(*self.__credentials)
+            with self.__statslock:
+                self.__stats["relogins"] += 1
+            self.__notify("onSession", {"kind": "relogin"})
+
+        return True
+
+
+    def __keepAlive(self, stop, interval):
+        """
+        Refreshes session until stop is set
+        """
+
+        while not stop.wait(interval):
+            sessionhash = self.__tokens.getSessionHash()
+            try:
+                self.__tokens.refresh(self.__getNewCSRF)
+                with self.__statslock:
+                    self.__stats["keepalives"] += 1
+                self.__notify("onSession", {"kind": "keepalive"})
+            except CCPSessionExpired:
+                try:
+                    if self.__relogin and self.__credentials is not None:
+                        self.__reauthenticate(sessionhash)
+                except (CCPError, OSError):
+                    with self.__statslock:
+                        self.__stats["keepalive_errors"] += 1
+                    self.__notify("onSession", {"kind": "keepalive_error"})
+            except (CCPError, OSError):
+                with self.__statslock:
+                    self.__stats["keepalive_errors"] += 1
+                self.__notify("onSession", {"kind": "keepalive_error"})
+
+
+    def __request(self, url, data=None, event=None):
+        """
+        Sends request and returns decoded content
+        """
+
+        return "".join(self.__stream(url, data, event))
+
+
+    def __stream(self, url, data=None, event=None, emit=True):
+        """
+        Sends request and yields decoded content in chunks
+
+        Timings are collected in event, time spent by the consumer of the
+        chunks counts as parse phase. With emit the event is passed to the
+        observers after the last chunk.
+        """
+
+        if event is None:
+            event = self.__newEvent(url, data)
+
+        # wait for rate limiter
+        action = event["action"].rsplit("?", 1)[-1]
+        if self.__ratelimit is not None:
+            start = time.perf_counter()
+            self.__ratelimit.acquire(action)
+            event["wait"] = time.perf_counter() - start
 
         try:
-            self.__sessionhash = search(r"sessionhash = \"(.*?)\";", html).group(1)
-        except AttributeError:
-            pass
+            resource = self.__network.open(url, data, jar=self.__jar)
+        except OSError as e:
+            event["error"] = str(e)
+            if self.__ratelimit is not None:
+                self.__ratelimit.release(action, None, True)
+            self.__emit(event)
+            raise
 
         try:
-            self.__nocsrftoken = search(r"nocsrftoken = \"(.*?)\";", html).group(1)
-        except AttributeError:
+            decoder = getincrementaldecoder(resource.headers.get_content_charset() or "utf-8")()
+            event["status"] = resource.status
+            for chunk in resource.iterContent():
+                start = time.perf_counter()
+                text = decoder.decode(chunk)
+                event["decode"] += time.perf_counter() - start
+                if text:
+                    start = time.perf_counter()
+                    yield text
+                    event["parse"] += time.perf_counter() - start
+
+            text = decoder.decode(b"", True)
+            if text:
+                yield text
+        except OSError as e:
+            event["error"] = str(e)
+            emit = True
+            raise
+        finally:
+            resource.close()
+
+            # merge transport metrics
+            metrics = resource.metrics
+            for key in ("connect", "ttfb", "transfer", "decode"):
+                event[key] += metrics[key]
+            event["retries"] = metrics["retries"]
+            event["bytes_received"] = metrics["received"]
+            event["bytes_decoded"] = metrics["decoded"]
+            if self.__ratelimit is not None:
+                self.__ratelimit.release(action, metrics["ttfb"], event["error"] is not None)
+            if emit:
+                self.__emit(event)
+
+
+    def __newEvent(self, url, data=None):
+        """
+        Returns request event of url
+        """
+
+        parts = urlsplit(url)
+        action = parse_qs(parts.query).get("action") or (parse_qs(data.decode("utf-8")).get("action") if data else None)
+        event = {"action":         parts.path.rsplit("/", 1)[-1] + ("?" + action[0] if action else ""),
+                 "status":         None,
+                 "error":          None,
+                 "retries":        0,
+                 "bytes_sent":     len(data) if data else 0,
+                 "bytes_received": 0,
+                 "bytes_decoded":  0,
+                 "wait":           0.0,
+                 "start":          time.perf_counter()}
+        event.update(dict.fromkeys(PHASES, 0.0))
+        return event
+
+
+    def __emit(self, event):
+        """
+        Passes request event to observers once
+        """
+
+        start = event.pop("start", None)
+        if start is None:
+            return
+
+        event["total"] = time.perf_counter() - start
+        self.__notify("onRequest", event)
+
+
+    def __notify(self, method, event):
+        """
+        Calls method of all observers with event
+
+        Errors of observers are logged and never affect the request
+        """
+
+        for observer in self.__observers:
             try:
-                self.__nocsrftoken = search(r"nocsrftoken = '(.*?)';", html).group(1)
-            except AttributeError:
-                self.__getNewCSRF()
+                getattr(observer, method)(event)
+            except Exception:
+                logger.exception("Observer %r failed in %s", observer, method)
+
+
+    def __scanTokens(self, chunks, ticket=None):
+        """
+        Yields chunks and retrieves session and csrf token of all chunks
+        """
+
+        scanner = CCPTokenScanner()
+        for chunk in chunks:
+            scanner.feed(chunk)
+            yield chunk
 
+        self.__setTokens(ticket, *scanner.getTokens())
 
-    def __getNewCSRF(self):
+
+    def __getTokens(self, html, ticket=None):
+        """
+        Retrieves session and csrf token
+        """
+
+        scanner = CCPTokenScanner()
+        scanner.feed(html)
+        self.__setTokens(ticket, *scanner.getTokens())
+
+
+    def __setTokens(self, ticket, expired, sessionhash, nocsrftoken):
+        """
+        Stores found tokens or raises CCPSessionExpired
+        """
+
+        # check session
+        if expired:
+            raise CCPSessionExpired("CCP session expired")
+
+        self.__tokens.update(ticket, sessionhash, nocsrftoken)
+        if nocsrftoken is None:
+            if self.__tokens.refresh(self.__getNewCSRF, force=False):
+                self.__notify("onSession", {"kind": "csrf_refresh"})
+
+
+    def __getNewCSRF(self, sessionhash):
         """
         Gets new csrf token from api
         """
 
         # request token
-        resource = self.__network.open("https://ccp.netcup.net/run/nocrfs_ajax.php?&action=getnocsrftoken&sessionhash=" + self.__sessionhash)
-        self.__nocsrftoken = decompress(resource.read()).decode(resource.headers.get_content_charset())
+        nocsrftoken = self.__request(self.__url + "nocrfs_ajax.php?&action=getnocsrftoken&sessionhash=" + str(sessionhash))
 
-        if "Your session has expired" in self.__nocsrftoken:
+        if "Your session has expired" in nocsrftoken:
             raise CCPSessionExpired("CCP session expired")
+
+        return nocsrftoken
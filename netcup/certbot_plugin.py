@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Copyright (C) 2018 MrKrabat
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+'''
+Certbot dns-01 authenticator for the netcup CCP
+
+Certbot finds plugins through the "certbot.plugins" entry point, register
+the authenticator in the package installing this module:
+
+entry_points={"certbot.plugins": ["dns-netcup = netcup.certbot_plugin:Authenticator"]}
+
+Credentials INI file (chmod 600):
+
+dns_netcup_username = <CCP LOGIN>
+dns_netcup_password = <CCP PASSWORD>
+
+certbot certonly --authenticator dns-netcup --dns-netcup-credentials netcup.ini -d domain.tld -d *.domain.tld
+'''
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import propagation
+    from ccp import CCPConnection
+    from exception import *
+except ImportError:
+    from . import propagation
+    from .ccp import CCPConnection
+    from .exception import *
+
+try:
+    from certbot import errors
+    from certbot.plugins import dns_common
+except ImportError:
+    # certbot is only required for the plugin
+    dns_common = None
+
+logger = logging.getLogger(__name__)
+
+
+class CCPChallengeDeployer(object):
+    """
+    Deploys dns-01 challenges of many domains with one save per zone
+    """
+
+    def __init__(self, connection, max_workers=4, minimal=False):
+        """
+        Creates deployer using logged in CCPConnection
+
+        minimal sends only changed records instead of the whole zone
+        """
+
+        self.__ccp = connection
+        self.__max_workers = max_workers
+        self.__minimal = minimal
+        self.__zones = None
+
+
+    def findZone(self, name):
+        """
+        Returns tuple of domain id and name of zone containing name
+        """
+
+        # index domain list once
+        if self.__zones is None:
+            self.__zones = {domain_name.lower(): domain_id for domain_id, domain_name in self.__ccp.iterDomains()}
+
+        labels = name.lower().rstrip(".").split(".")
+        for i in range(len(labels) - 1):
+            zone = ".".join(labels[i:])
+            if zone in self.__zones:
+                return self.__zones[zone], zone
+
+        raise KeyError("Domain " + str(name) + " not found in ccp")
+
+
+    def deploy(self, challenges):
+        """
+        Adds TXT records, returns dict of domain id and list of records
+
+        challenges is an iterable of tuples of validation name and value.
+        Every zone is saved once, the returned records of fully qualified
+        name, type and destination can be passed to waitForLive.
+        """
+
+        return self.__apply(challenges, self.__add)
+
+
+    def cleanup(self, challenges):
+        """
+        Removes TXT records of challenges with one save per zone
+        """
+
+        self.__apply(challenges, self.__remove)
+        return True
+
+
+    def wait(self, records, timeout=900):
+        """
+        Waits until all zones are live, returns list of domain ids still pending
+
+        Records are checked on the authoritative nameservers if dnspython is
+        installed.
+        """
+
+        # check zone state only without dnspython
+        state = self.__ccp.waitForLive(list(records), timeout=timeout,
+                                       records=records if propagation.dns is not None else None)
+        return [domain_id for domain_id, live in state.items() if not live]
+
+
+    def __apply(self, challenges, action):
+        """
+        Calls action for every challenge and saves each zone once
+        """
+
+        # group challenges by zone
+        zones = {}
+        for name, validation in challenges:
+            domain_id, zone = self.findZone(name)
+            host = name.lower().rstrip(".")[:-(len(zone) + 1)]
+            zones.setdefault(domain_id, (zone, []))[1].append((host, validation))
+
+        def save(domain_id):
+            zone, entries = zones[domain_id]
+            domain_obj = self.__ccp.getDomain(domain_id)
+            with domain_obj.batch():
+                for host, validation in entries:
+                    action(domain_obj, host, validation)
+
+            self.__ccp.saveDomain(domain_obj, minimal=self.__minimal)
+            return [(host + "." + zone, "TXT", validation) for host, validation in entries]
+
+        if not zones:
+            return {}
+
+        with ThreadPoolExecutor(max_workers=min(self.__max_workers, len(zones))) as executor:
+            return dict(zip(zones, executor.map(save, zones)))
+
+
+    def __add(self, domain_obj, host, validation):
+        """
+        Adds TXT record unless it exists
+        """
+
+        for record in domain_obj.searchRecord(rr_host=host, rr_type="TXT").values():
+            if record["destination"] == validation and not "delete" in record:
+                return
+
+        domain_obj.addRecord(rr_host=host, rr_type="TXT", rr_destination=validation)
+
+
+    def __remove(self, domain_obj, host, validation):
+        """
+        Removes matching TXT records
+        """
+
+        for rr_id, record in domain_obj.searchRecord(rr_host=host, rr_type="TXT").items():
+            if record["destination"] == validation and not "delete" in record:
+                domain_obj.removeRecord(rr_id)
+
+
+if dns_common is not None:
+    class Authenticator(dns_common.DNSAuthenticator):
+        """
+        Certbot authenticator deploying all challenges in one batch
+        """
+
+        description = "Obtain certificates using DNS TXT records in the netcup CCP."
+
+        def __init__(self, *args, **kwargs):
+            """
+            Creates authenticator
+            """
+
+            super().__init__(*args, **kwargs)
+            self.credentials = None
+            self.__ccp = None
+            self.__deployer = None
+
+
+        @classmethod
+        def add_parser_arguments(cls, add):
+            """
+            Adds command line arguments
+            """
+
+            super(Authenticator, cls).add_parser_arguments(add, default_propagation_seconds=900)
+            add("credentials", help="netcup CCP credentials INI file.")
+            add("cachepath", default=None, help="Session cache file shared between certbot runs.")
+            add("minimal-save", action="store_true", default=False,
+                help="Send only changed records instead of the whole zone.")
+
+
+        def more_info(self):
+            """
+            Returns plugin description
+            """
+
+            return "This plugin configures DNS TXT records to respond to dns-01 challenges using the netcup CCP."
+
+
+        def perform(self, achalls):
+            """
+            Deploys all challenges, saves each zone once and waits for all zones
+            """
+
+            self._setup_credentials()
+            self._attempt_cleanup = True
+
+            try:
+                deployer = self.__getDeployer()
+                pending = deployer.wait(deployer.deploy(self.__challenges(achalls)), timeout=self.conf("propagation-seconds"))
+            except (CCPError, KeyError, OSError) as e:
+                raise errors.PluginError("netcup CCP: " + str(e))
+
+            if pending:
+                logger.warning("Zones %s are not live yet", ", ".join(pending))
+
+            return [achall.response(achall.account_key) for achall in achalls]
+
+
+        def cleanup(self, achalls):
+            """
+            Removes all challenges with one save per zone
+            """
+
+            if not self._attempt_cleanup:
+                return
+
+            try:
+                self.__getDeployer().cleanup(self.__challenges(achalls))
+            except (CCPError, KeyError, OSError) as e:
+                raise errors.PluginError("netcup CCP: " + str(e))
+            finally:
+                if self.__ccp is not None:
+                    self.__ccp.close()
+                    self.__ccp = None
+                    self.__deployer = None
+
+
+        def _setup_credentials(self):
+            """
+            Reads credentials INI file
+            """
+
+            self.credentials = self._configure_credentials("credentials", "netcup CCP credentials INI file",
+                                                           {"username": "CCP login", "password": "CCP password"})
+
+
+        def _perform(self, domain, validation_name, validation):
+            """
+            Deploys single challenge
+            """
+
+            self.__getDeployer().deploy([(validation_name, validation)])
+
+
+        def _cleanup(self, domain, validation_name, validation):
+            """
+            Removes single challenge
+            """
+
+            self.__getDeployer().cleanup([(validation_name, validation)])
+
+
+        def __getDeployer(self):
+            """
+            Returns deployer of logged in connection
+            """
+
+            if self.__deployer is None:
+                self.__ccp = CCPConnection(cachepath=self.conf("cachepath"), parser="stream")
+                self.__ccp.start(self.credentials.conf("username"), self.credentials.conf("password"))
+                self.__deployer = CCPChallengeDeployer(self.__ccp, minimal=self.conf("minimal-save"))
+
+            return self.__deployer
+
+
+        def __challenges(self, achalls):
+            """
+            Returns list of validation names and values
+            """
+
+            challenges = []
+            for achall in achalls:
+                domain = achall.identifier.value
+                challenges.append((achall.validation_domain_name(domain), achall.validation(achall.account_key)))
+
+            return challenges
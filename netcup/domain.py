@@ -7,10 +7,18 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
-import copy
+from bisect import bisect_left, insort
+from types import MappingProxyType
+from contextlib import contextmanager
+
+try:
+    from record import CCPRecord
+except ImportError:
+    from .record import CCPRecord
 
 
 RR_ALLOWED_TYPES = ["A", "AAAA", "MX", "TXT", "CNAME", "SRV", "NS", "DS", "TLSA", "CAA", "SSHFP", "SMIMEA", "OPENPGPKEY"]
+RR_ALLOWED_SET   = frozenset(RR_ALLOWED_TYPES)
 
 
 class CCPDomain(object):
@@ -44,25 +52,92 @@ class CCPDomain(object):
         self.__changed    = False
         self.__newcount   = 0
         self.__rr         = {}
+        self.__dirty      = {}
+
+        # secondary indexes, dicts are used as ordered sets of record ids
+        self.__byhost     = {}
+        self.__bytype     = {}
+        self.__byhosttype = {}
+        self.__hosts      = []
+        self.__rhosts     = []
+
+        # undo log of running batch
+        self.__journal    = None
 
 
     def getAllRecords(self):
         """
         Returns dict containing all resource records
+
+        Records are returned as plain dicts for compatibility, use
+        getRecordsView or iterRecords for zero-copy CCPRecord objects
         """
 
-        return copy.deepcopy(self.__rr)
+        return {rr_id: dict(record) for rr_id, record in self.__rr.items()}
 
 
-    def getRecord(self, rr_id):
+    def getRecordsView(self):
+        """
+        Returns read-only view of all resource records without copying
+
+        Records are immutable CCPRecord objects
+        """
+
+        return MappingProxyType(self.__rr)
+
+
+    def iterRecords(self, changed_only=False):
         """
-        Returns resource record for id
+        Yields tuple of id and immutable CCPRecord without copying
+
+        With changed_only only added, modified and deleted records are
+        returned
         """
 
-        if rr_id in self.__rr:
-            return copy.deepcopy(self.__rr[rr_id])
+        if changed_only:
+            for rr_id in self.__dirty:
+                if rr_id in self.__rr:
+                    yield rr_id, self.__rr[rr_id]
         else:
-            return False
+            for rr_id, value in self.__rr.items():
+                yield rr_id, value
+
+
+    def getChanges(self):
+        """
+        Returns dict containing added, modified and deleted records
+        """
+
+        ret = {"added": {}, "modified": {}, "deleted": {}}
+        for rr_id, value in self.iterRecords(changed_only=True):
+            value = dict(value)
+            if "new[" in rr_id:
+                ret["added"][rr_id] = value
+            elif "delete" in value:
+                ret["deleted"][rr_id] = value
+            else:
+                ret["modified"][rr_id] = value
+
+        return ret
+
+
+    def clearChanges(self):
+        """
+        Marks domain and all records as saved
+        """
+
+        self.__changed = False
+        self.__dirty.clear()
+        return True
+
+
+    def getRecord(self, rr_id):
+        """
+        Returns resource record for id as dict
+        """
+
+        record = self.__rr.get(rr_id)
+        return dict(record) if record is not None else False
 
 
     def setRecord(self, rr_id, rr_host=None, rr_type=None, rr_destination=None, rr_pri=None):
@@ -71,26 +146,30 @@ class CCPDomain(object):
         """
 
         # check if rr_type allowed
-        if rr_type and not rr_type in RR_ALLOWED_TYPES:
+        if rr_type and not rr_type in RR_ALLOWED_SET:
             raise ValueError("Not supported resource record")
         # check if id exists
-        if not self.getRecord(rr_id):
+        record = self.__rr.get(rr_id)
+        if record is None:
             return False
 
         # update values
-        self.__changed = True
+        values = {}
         if rr_host:
-            self.__rr[rr_id]["host"] = rr_host
+            values["host"] = rr_host
 
         if rr_type:
-            self.__rr[rr_id]["type"] = rr_type
+            values["type"] = rr_type
 
         if rr_pri:
-            self.__rr[rr_id]["pri"] = rr_pri
+            values["pri"] = rr_pri
 
         if rr_destination:
-            self.__rr[rr_id]["destination"] = rr_destination
+            values["destination"] = rr_destination
 
+        self.__put(rr_id, record.replace(**values))
+        self.__changed = True
+        self.__dirty[rr_id] = None
         return True
 
 
@@ -100,19 +179,20 @@ class CCPDomain(object):
         """
 
         # check if rr_type allowed
-        if not rr_type in RR_ALLOWED_TYPES:
+        if not rr_type in RR_ALLOWED_SET:
             raise ValueError("Not supported resource record")
 
         new_id = False
         if not rr_id:
             new_id = "new[" + str(self.__newcount) + "]"
-            self.__rr[new_id] = {"host": rr_host, "type": rr_type, "pri": rr_pri, "destination": rr_destination}
+            self.__put(new_id, CCPRecord(rr_host, rr_type, rr_pri, rr_destination))
             self.__newcount += 1
         else:
             new_id = rr_id
-            self.__rr[rr_id] = {"host": rr_host, "type": rr_type, "pri": rr_pri, "destination": rr_destination}
+            self.__put(rr_id, CCPRecord(rr_host, rr_type, rr_pri, rr_destination))
 
         self.__changed = True
+        self.__dirty[new_id] = None
         return new_id
 
 
@@ -123,15 +203,151 @@ class CCPDomain(object):
 
         if "new[" in rr_id:
             # delete new enty
-            self.__rr.pop(rr_id, False)
+            self.__pop(rr_id)
+            self.__dirty.pop(rr_id, None)
         else:
             # delete entry on server
-            self.__rr[rr_id]["delete"] = rr_id[7:-1]
+            self.__put(rr_id, self.__rr[rr_id].replace(delete=rr_id[7:-1]))
+            self.__dirty[rr_id] = None
 
         self.__changed = True
         return True
 
 
+    @contextmanager
+    def batch(self):
+        """
+        Context manager applying all changes atomically
+
+        If an exception is raised inside the block all record and setting
+        changes of the block are rolled back. Nested batches are part of the
+        outermost batch.
+        """
+
+        # nested batch
+        if self.__journal is not None:
+            yield self
+            return
+
+        state = (self.__changed, self.__newcount, dict(self.__dirty), self.__serial, self.__dnssec,
+                 self.__ttl, self.__retry, self.__expire, self.__refresh)
+        self.__journal = {}
+        try:
+            yield self
+        except BaseException:
+            journal = self.__journal
+            self.__journal = None
+
+            # restore records in reverse order
+            for rr_id, record in reversed(list(journal.items())):
+                if record is None:
+                    self.__pop(rr_id)
+                else:
+                    self.__put(rr_id, record)
+
+            (self.__changed, self.__newcount, self.__dirty, self.__serial, self.__dnssec,
+             self.__ttl, self.__retry, self.__expire, self.__refresh) = state
+            raise
+        finally:
+            self.__journal = None
+
+
+    def applyChanges(self, changes):
+        """
+        Applies list of changes atomically, returns list of results
+
+        Every change is a tuple of "add", "set" or "remove" and a dict of
+        keyword arguments of addRecord, setRecord or removeRecord. Raises
+        ValueError and rolls back all changes if one change is invalid.
+        """
+
+        ret = []
+        with self.batch():
+            for index, (action, kwargs) in enumerate(changes):
+                try:
+                    if action == "add":
+                        ret.append(self.addRecord(**kwargs))
+                    elif action == "set":
+                        if not self.setRecord(**kwargs):
+                            raise ValueError("Record does not exist")
+                        ret.append(True)
+                    elif action == "remove":
+                        if not kwargs.get("rr_id") in self.__rr:
+                            raise ValueError("Record does not exist")
+                        ret.append(self.removeRecord(**kwargs))
+                    else:
+                        raise ValueError("Unknown action " + str(action))
+                except (TypeError, ValueError) as e:
+                    raise ValueError("Invalid change " + str(index) + ": " + str(e))
+
+        return ret
+
+
+    def __put(self, rr_id, record):
+        """
+        Stores record and updates indexes
+        """
+
+        old = self.__rr.get(rr_id)
+        if self.__journal is not None and rr_id not in self.__journal:
+            self.__journal[rr_id] = old
+        if old is not None:
+            if old.host == record.host and old.type == record.type:
+                self.__rr[rr_id] = record
+                return
+            self.__unindex(rr_id, old)
+
+        self.__rr[rr_id] = record
+        self.__index(rr_id, record)
+
+
+    def __pop(self, rr_id):
+        """
+        Removes record and updates indexes
+        """
+
+        record = self.__rr.pop(rr_id, None)
+        if record is not None:
+            if self.__journal is not None and rr_id not in self.__journal:
+                self.__journal[rr_id] = record
+            self.__unindex(rr_id, record)
+
+        return record
+
+
+    def __index(self, rr_id, record):
+        """
+        Adds record to indexes
+        """
+
+        ids = self.__byhost.get(record.host)
+        if ids is None:
+            ids = self.__byhost[record.host] = {}
+            insort(self.__hosts, record.host)
+            insort(self.__rhosts, record.host[::-1])
+        ids[rr_id] = None
+
+        self.__bytype.setdefault(record.type, {})[rr_id] = None
+        self.__byhosttype.setdefault((record.host, record.type), {})[rr_id] = None
+
+
+    def __unindex(self, rr_id, record):
+        """
+        Removes record from indexes
+        """
+
+        for index, key in ((self.__byhost, record.host), (self.__bytype, record.type), (self.__byhosttype, (record.host, record.type))):
+            ids = index[key]
+            del ids[rr_id]
+            if not ids:
+                del index[key]
+
+        # host not used anymore
+        if record.host not in self.__byhost:
+            del self.__hosts[bisect_left(self.__hosts, record.host)]
+            del self.__rhosts[bisect_left(self.__rhosts, record.host[::-1])]
+
+
     def getDNSSEC(self):
         """
         Returns domain dnssec state
@@ -252,17 +468,64 @@ class CCPDomain(object):
 
     def searchRecord(self, rr_host, rr_type):
         """
-        Returns all matching records
+        Returns all matching records as dicts
+        """
+
+        # check if rr_type allowed
+        if not rr_type in RR_ALLOWED_SET:
+            raise ValueError("Not supported resource record")
+
+        return {rr_id: dict(self.__rr[rr_id]) for rr_id in self.__byhosttype.get((rr_host, rr_type), ())}
+
+
+    def findRecords(self, rr_host=None, rr_type=None):
+        """
+        Returns all records matching host and type using indexes
+
+        Records are immutable CCPRecord objects and are not copied.
+        rr_host "_acme-challenge*" matches all hosts starting with
+        "_acme-challenge", "*.sub" all hosts ending with ".sub". None matches
+        every host or type.
         """
 
         # check if rr_type allowed
-        if not rr_type in RR_ALLOWED_TYPES:
+        if rr_type is not None and not rr_type in RR_ALLOWED_SET:
             raise ValueError("Not supported resource record")
 
+        # select hosts
+        if rr_host is None:
+            if rr_type is None:
+                return dict(self.__rr)
+            return {rr_id: self.__rr[rr_id] for rr_id in self.__bytype.get(rr_type, ())}
+        elif len(rr_host) > 1 and rr_host.endswith("*"):
+            hosts = self.__match(self.__hosts, rr_host[:-1])
+        elif len(rr_host) > 1 and rr_host.startswith("*"):
+            hosts = [host[::-1] for host in self.__match(self.__rhosts, rr_host[1:][::-1])]
+        else:
+            hosts = [rr_host]
+
         ret = {}
-        for key, value in self.__rr.items():
-            if value["host"] == rr_host and value["type"] == rr_type:
-                ret[key] = copy.deepcopy(value)
+        for host in hosts:
+            if rr_type is None:
+                ids = self.__byhost.get(host, ())
+            else:
+                ids = self.__byhosttype.get((host, rr_type), ())
+            for rr_id in ids:
+                ret[rr_id] = self.__rr[rr_id]
+
+        return ret
+
+
+    def __match(self, hosts, prefix):
+        """
+        Returns all entries of sorted list starting with prefix
+        """
+
+        ret = []
+        for i in range(bisect_left(hosts, prefix), len(hosts)):
+            if not hosts[i].startswith(prefix):
+                break
+            ret.append(hosts[i])
 
         return ret
 
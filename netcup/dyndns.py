@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Copyright (C) 2018 MrKrabat
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import socket
+import time
+import logging
+import threading
+from functools import partial
+from ipaddress import ip_address
+from urllib.request import urlopen
+
+try:
+    from exception import *
+except ImportError:
+    from .exception import *
+
+logger = logging.getLogger(__name__)
+
+# addresses used to select the outgoing interface, no packet is sent
+ROUTE_TARGETS = {"A":    (socket.AF_INET,  "192.0.2.1"),
+                 "AAAA": (socket.AF_INET6, "2001:db8::1")}
+
+
+def localAddress(rr_type="A"):
+    """
+    Returns address of the interface used for outgoing traffic or None
+
+    Private addresses are ignored, use publicAddress behind NAT
+    """
+
+    family, target = ROUTE_TARGETS[rr_type]
+    try:
+        with socket.socket(family, socket.SOCK_DGRAM) as sock:
+            sock.connect((target, 53))
+            address = sock.getsockname()[0]
+    except OSError:
+        return None
+
+    return address if ip_address(address).is_global else None
+
+
+def publicAddress(url, timeout=10):
+    """
+    Returns address answered as plain text by url or None
+
+    e.g. "https://api.ipify.org" or "https://api6.ipify.org"
+    """
+
+    try:
+        with urlopen(url, timeout=timeout) as response:
+            return str(ip_address(response.read(64).decode("ascii").strip()))
+    except (OSError, ValueError):
+        return None
+
+
+class CCPDynDNS(object):
+    """
+    Updates address records when the addresses of this host change
+
+    Addresses are compared with the last published ones, the zone is only
+    requested after a change. Changes of all hosts of a zone within the
+    debounce window are saved together.
+    """
+
+    def __init__(self, connection, interval=60, debounce=5, minimal=False):
+        """
+        Creates daemon using logged in CCPConnection
+
+        Addresses are checked every interval seconds, a zone is saved
+        debounce seconds after its first pending change. minimal sends
+        only changed records instead of the whole zone.
+        """
+
+        self.__ccp       = connection
+        self.__interval  = interval
+        self.__debounce  = debounce
+        self.__minimal   = minimal
+        self.__lock      = threading.Lock()
+        self.__hosts     = {}
+        self.__published = {}
+        self.__pending   = {}
+        self.__detectors = {rr_type: partial(localAddress, rr_type) for rr_type in ROUTE_TARGETS}
+        self.__thread    = None
+        self.__stats     = {"checks":  0,
+                            "changes": 0,
+                            "saves":   0,
+                            "errors":  0}
+
+
+    def addHost(self, domain_id, rr_host, rr_type="A", detector=None):
+        """
+        Adds record to keep up to date
+
+        detector is a callable returning the current address or None,
+        default is the local address of the outgoing interface
+        """
+
+        if not rr_type in ROUTE_TARGETS:
+            raise ValueError("Only A and AAAA records are supported")
+
+        if detector is None:
+            detector = self.__detectors[rr_type]
+
+        with self.__lock:
+            self.__hosts[(str(domain_id), rr_host, rr_type)] = detector
+
+        return True
+
+
+    def check(self):
+        """
+        Detects address changes, returns number of changed records
+        """
+
+        with self.__lock:
+            hosts = list(self.__hosts.items())
+
+        # call every detector once per check
+        addresses = {}
+        changed = 0
+        errors = 0
+        for key, detector in hosts:
+            if not detector in addresses:
+                try:
+                    addresses[detector] = detector()
+                except Exception:
+                    logger.exception("Address detection failed")
+                    addresses[detector] = None
+                    errors += 1
+            address = addresses[detector]
+            if address is None:
+                continue
+
+            with self.__lock:
+                pending = self.__pending.get(key[0])
+
+                # changed back before it was saved
+                if self.__published.get(key) == address:
+                    if pending is not None and pending[1].pop(key, None) is not None and not pending[1]:
+                        del self.__pending[key[0]]
+                    continue
+
+                if pending is None or pending[1].get(key) != address:
+                    if pending is None:
+                        pending = self.__pending[key[0]] = (time.monotonic(), {})
+                    pending[1][key] = address
+                    changed += 1
+
+        with self.__lock:
+            self.__stats["checks"] += 1
+            self.__stats["changes"] += changed
+            self.__stats["errors"] += errors
+
+        return changed
+
+
+    def flush(self, force=False):
+        """
+        Saves zones whose debounce window passed, returns number of saves
+
+        force saves all pending zones. Failed zones stay pending.
+        """
+
+        now = time.monotonic()
+        with self.__lock:
+            due = [domain_id for domain_id, (first, _) in self.__pending.items() if force or now - first >= self.__debounce]
+            zones = {domain_id: self.__pending.pop(domain_id)[1] for domain_id in due}
+
+        saves = 0
+        for domain_id, zone in zones.items():
+            try:
+                if self.__update(domain_id, zone):
+                    saves += 1
+            except Exception as e:
+                # retry after next check
+                if not isinstance(e, (CCPError, OSError)):
+                    logger.exception("Saving zone %s failed", domain_id)
+                with self.__lock:
+                    pending = self.__pending.setdefault(domain_id, (time.monotonic() + self.__interval, {}))
+                    for key, address in zone.items():
+                        pending[1].setdefault(key, address)
+                    self.__stats["errors"] += 1
+                continue
+
+            with self.__lock:
+                self.__published.update(zone)
+
+        with self.__lock:
+            self.__stats["saves"] += saves
+
+        return saves
+
+
+    def runOnce(self, force=False):
+        """
+        Checks addresses and saves due zones, returns number of saves
+        """
+
+        self.check()
+        return self.flush(force)
+
+
+    def start(self):
+        """
+        Runs daemon in background thread
+        """
+
+        self.stop()
+        stop = threading.Event()
+        thread = threading.Thread(target=self.__run, args=(stop,), daemon=True)
+        self.__thread = (stop, thread)
+        thread.start()
+        return True
+
+
+    def stop(self):
+        """
+        Stops background thread and saves pending changes
+        """
+
+        if self.__thread is None:
+            return False
+
+        stop, thread = self.__thread
+        self.__thread = None
+        stop.set()
+        thread.join()
+        self.flush(force=True)
+        return True
+
+
+    def getStats(self):
+        """
+        Returns dict containing daemon counters
+        """
+
+        with self.__lock:
+            stats = dict(self.__stats)
+            stats["pending"] = sum(len(zone) for _, zone in self.__pending.values())
+
+        return stats
+
+
+    def __run(self, stop):
+        """
+        Checks addresses every interval until stop is set
+        """
+
+        next_check = 0
+        while not stop.is_set():
+            now = time.monotonic()
+            try:
+                if now >= next_check:
+                    next_check = now + self.__interval
+                    self.check()
+                self.flush()
+            except Exception:
+                # keep daemon running
+                logger.exception("DynDNS update failed")
+                with self.__lock:
+                    self.__stats["errors"] += 1
+
+            # wake up for next check or debounce window
+            with self.__lock:
+                due = [first + self.__debounce for first, _ in self.__pending.values()]
+            stop.wait(max(0, min([next_check] + due) - time.monotonic()))
+
+
+    def __update(self, domain_id, zone):
+        """
+        Sets changed records of zone, returns True if zone was saved
+        """
+
+        domain_obj = self.__ccp.getDomain(domain_id)
+        for (_, rr_host, rr_type), address in zone.items():
+            records = [(rr_id, record) for rr_id, record in domain_obj.searchRecord(rr_host=rr_host, rr_type=rr_type).items() if not "delete" in record]
+            if not records:
+                domain_obj.addRecord(rr_host=rr_host, rr_type=rr_type, rr_destination=address)
+            elif records[0][1]["destination"] != address:
+                domain_obj.setRecord(records[0][0], rr_destination=address)
+
+        if not domain_obj.hasChanged():
+            return False
+
+        self.__ccp.saveDomain(domain_obj, minimal=self.__minimal)
+        return True
@@ -41,3 +41,10 @@ class CCPSaveDomainError(CCPError):
     Raised, if failed to save domain
     """
     pass
+
+
+class CCPRateLimitError(CCPError):
+    """
+    Raised, if request waited too long for rate limiter
+    """
+    pass
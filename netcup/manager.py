@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Copyright (C) 2018 MrKrabat
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from ccp import CCPConnection
+    from transport import CCPTransport
+    from exception import *
+except ImportError:
+    from .ccp import CCPConnection
+    from .transport import CCPTransport
+    from .exception import *
+
+
+class CCPManager(object):
+    """
+    Manages sessions of many CCP accounts
+
+    All connections share one transport, accounts are logged in on first
+    use and operations are routed to the account owning the domain.
+    """
+
+    def __init__(self, transport=None, pool_size=16, max_workers=8, login_backoff=60, max_login_backoff=3600, **kwargs):
+        """
+        Creates manager, kwargs are passed to every CCPConnection
+
+        After a failed login the account is not logged in again for
+        login_backoff seconds, doubled after every further failure up to
+        max_login_backoff, to avoid locking the account.
+        """
+
+        self.__transport   = transport if transport is not None else CCPTransport(pool_size=pool_size)
+        self.__owntransport = transport is None
+        self.__max_workers = max_workers
+        self.__backoff     = (login_backoff, max_login_backoff)
+        self.__kwargs      = kwargs
+        self.__lock        = threading.Lock()
+        self.__accounts    = {}
+        self.__domains     = {}
+
+
+    def addAccount(self, name, username, password, token_2FA=None, cachepath=None, **kwargs):
+        """
+        Adds account, login is performed on first use
+
+        token_2FA can be a callable returning the current token, kwargs
+        override the CCPConnection arguments of the manager
+        """
+
+        with self.__lock:
+            if name in self.__accounts:
+                raise ValueError("Account " + str(name) + " already exists")
+
+            self.__accounts[name] = {"username":   username,
+                                     "password":   password,
+                                     "token_2FA":  token_2FA,
+                                     "cachepath":  cachepath,
+                                     "kwargs":     dict(self.__kwargs, **kwargs),
+                                     "connection": None,
+                                     "indexed":    False,
+                                     "failed":     None,
+                                     "lock":       threading.Lock()}
+
+        return True
+
+
+    def getAccounts(self):
+        """
+        Returns list of account names
+        """
+
+        with self.__lock:
+            return list(self.__accounts)
+
+
+    def getConnection(self, name):
+        """
+        Returns logged in CCPConnection of account
+
+        Raises the error of the last failed login during its backoff
+        """
+
+        account = self.__account(name)
+        with account["lock"]:
+            if account["connection"] is None:
+                failed = account["failed"]
+                if failed is not None and time.monotonic() < failed[0]:
+                    raise failed[2]
+
+                connection = CCPConnection(cachepath=account["cachepath"], transport=self.__transport, **account["kwargs"])
+                try:
+                    # callable is kept for relogins with a fresh token
+                    connection.start(account["username"], account["password"], account["token_2FA"])
+                except (CCPError, OSError) as e:
+                    backoff = min(failed[1] * 2, self.__backoff[1]) if failed is not None else self.__backoff[0]
+                    account["failed"] = (time.monotonic() + backoff, backoff, e)
+                    raise
+
+                account["failed"] = None
+                account["connection"] = connection
+
+            return account["connection"]
+
+
+    def login(self, names=None):
+        """
+        Logs in accounts in parallel, returns dict of name and exception
+
+        Successful logins have the value None
+        """
+
+        names = self.getAccounts() if names is None else list(names)
+        return dict(zip(names, self.__map(self.getConnection, names)))
+
+
+    def getConnectionForDomain(self, domain_name):
+        """
+        Returns tuple of CCPConnection and domain id owning domain name
+
+        domain_name can be a subdomain of a domain in one of the accounts
+        """
+
+        route = self.__route(domain_name)
+        if route is None:
+            # index domain lists of all accounts not indexed yet, skip accounts in login backoff
+            with self.__lock:
+                names = [name for name, account in self.__accounts.items() if not account["indexed"] and not self.__isBlocked(account)]
+            errors = self.__map(self.__index, names)
+
+            route = self.__route(domain_name)
+            if route is None:
+                # errors of failed logins only mean the account is not searched
+                with self.__lock:
+                    failed = [name for name, account in self.__accounts.items() if account["failed"] is not None]
+                errors = [e for name, e in zip(names, errors) if e is not None and not name in failed]
+                if errors:
+                    raise errors[0]
+                raise KeyError("Domain " + str(domain_name) + " not found in any account" +
+                               (" (login failed: " + ", ".join(map(str, failed)) + ")" if failed else ""))
+
+        return self.getConnection(route[0]), route[1]
+
+
+    def getDomain(self, domain_name):
+        """
+        Returns Domain object from account owning domain
+        """
+
+        connection, domain_id = self.getConnectionForDomain(domain_name)
+        return connection.getDomain(domain_id)
+
+
+    def saveDomain(self, domain_obj, minimal=False):
+        """
+        Saves domain object using account owning domain
+        """
+
+        connection, _ = self.getConnectionForDomain(domain_obj.getDomainName())
+        return connection.saveDomain(domain_obj, minimal=minimal)
+
+
+    def close(self):
+        """
+        Closes all logged in connections
+        """
+
+        with self.__lock:
+            accounts = list(self.__accounts.values())
+
+        for account in accounts:
+            with account["lock"]:
+                if account["connection"] is not None:
+                    account["connection"].close()
+                    account["connection"] = None
+
+        if self.__owntransport:
+            self.__transport.close()
+
+
+    def getStats(self):
+        """
+        Returns dict containing statistics of shared transport
+        """
+
+        stats = self.__transport.getStats()
+        with self.__lock:
+            stats["accounts"] = len(self.__accounts)
+            stats["sessions"] = sum(1 for account in self.__accounts.values() if account["connection"] is not None)
+            stats["domains"] = len(self.__domains)
+
+        return stats
+
+
+    def __account(self, name):
+        """
+        Returns account dict
+        """
+
+        with self.__lock:
+            try:
+                return self.__accounts[name]
+            except KeyError:
+                raise KeyError("Unknown account " + str(name))
+
+
+    def __index(self, name):
+        """
+        Adds all domains of account to routing table
+        """
+
+        domains = {domain_name.lower(): (name, domain_id) for domain_id, domain_name in self.getConnection(name).iterDomains()}
+        with self.__lock:
+            self.__domains.update(domains)
+            self.__accounts[name]["indexed"] = True
+
+
+    def __isBlocked(self, account):
+        """
+        Returns True if account is in backoff after a failed login
+        """
+
+        failed = account["failed"]
+        return account["connection"] is None and failed is not None and time.monotonic() < failed[0]
+
+
+    def __route(self, domain_name):
+        """
+        Returns tuple of account name and domain id or None
+        """
+
+        labels = domain_name.lower().rstrip(".").split(".")
+        with self.__lock:
+            for i in range(len(labels) - 1):
+                route = self.__domains.get(".".join(labels[i:]))
+                if route is not None:
+                    return route
+
+        return None
+
+
+    def __map(self, func, names):
+        """
+        Calls func for every name in parallel, returns list of exceptions
+        """
+
+        def call(name):
+            try:
+                func(name)
+            except (CCPError, OSError) as e:
+                return e
+            return None
+
+        if not names:
+            return []
+
+        with ThreadPoolExecutor(max_workers=min(self.__max_workers, len(names))) as executor:
+            return list(executor.map(call, names))
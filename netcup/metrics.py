@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Copyright (C) 2018 MrKrabat
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import sys
+import pstats
+import cProfile
+import threading
+from bisect import bisect_left
+
+
+PHASES = ("connect", "ttfb", "transfer", "decode", "parse", "encode")
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class CCPObserver(object):
+    """
+    Base class of CCPConnection observers
+
+    onRequest gets a dict per request with "action", "status", "error",
+    "retries", "bytes_sent", "bytes_received", "bytes_decoded", "total",
+    "wait" for the rate limiter and the phases "connect", "ttfb",
+    "transfer", "decode", "parse" and "encode" in seconds. onRetry gets
+    "call", "attempt" and "error" of calls repeated after a relogin,
+    onSession gets "kind" of session events: login, relogin, csrf_refresh,
+    keepalive, keepalive_error.
+    """
+
+    def onRequest(self, event):
+        """
+        Called after every request
+        """
+        pass
+
+
+    def onRetry(self, event):
+        """
+        Called before a call is repeated
+        """
+        pass
+
+
+    def onSession(self, event):
+        """
+        Called on session events
+        """
+        pass
+
+
+class CCPMetrics(CCPObserver):
+    """
+    Aggregates events and exports them in Prometheus text format
+    """
+
+    def __init__(self, prefix="netcup"):
+        """
+        Creates empty metrics
+        """
+
+        self.__prefix   = prefix
+        self.__lock     = threading.Lock()
+        self.__requests = {}
+        self.__retries  = {}
+        self.__sessions = {}
+
+
+    def onRequest(self, event):
+        """
+        Adds request to totals of its action
+        """
+
+        with self.__lock:
+            totals = self.__requests.get(event["action"])
+            if totals is None:
+                totals = self.__requests[event["action"]] = {"requests": 0,
+                                                             "errors":   0,
+                                                             "retries":  0,
+                                                             "sent":     0,
+                                                             "received": 0,
+                                                             "decoded":  0,
+                                                             "seconds":  0.0,
+                                                             "phases":   dict.fromkeys(PHASES, 0.0),
+                                                             "buckets":  [0] * (len(DURATION_BUCKETS) + 1)}
+
+            totals["requests"] += 1
+            totals["errors"]   += 1 if event["error"] else 0
+            totals["retries"]  += event["retries"]
+            totals["sent"]     += event["bytes_sent"]
+            totals["received"] += event["bytes_received"]
+            totals["decoded"]  += event["bytes_decoded"]
+            totals["seconds"]  += event["total"]
+            totals["buckets"][bisect_left(DURATION_BUCKETS, event["total"])] += 1
+            for phase in PHASES:
+                totals["phases"][phase] += event[phase]
+
+
+    def onRetry(self, event):
+        """
+        Counts repeated calls
+        """
+
+        with self.__lock:
+            self.__retries[event["call"]] = self.__retries.get(event["call"], 0) + 1
+
+
+    def onSession(self, event):
+        """
+        Counts session events
+        """
+
+        with self.__lock:
+            self.__sessions[event["kind"]] = self.__sessions.get(event["kind"], 0) + 1
+
+
+    def getStats(self):
+        """
+        Returns dict of action and its totals
+        """
+
+        with self.__lock:
+            return {action: dict(totals, phases=dict(totals["phases"]), buckets=list(totals["buckets"]))
+                    for action, totals in self.__requests.items()}
+
+
+    def exportPrometheus(self):
+        """
+        Returns all metrics in Prometheus text exposition format
+        """
+
+        prefix = self.__prefix
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append("# HELP " + prefix + "_" + name + " " + help_text)
+            lines.append("# TYPE " + prefix + "_" + name + " " + kind)
+            for suffix, labels, value in samples:
+                label = ",".join(key + '="' + _escape(str(val)) + '"' for key, val in labels)
+                lines.append(prefix + "_" + name + suffix + ("{" + label + "}" if label else "") + " " + _number(value))
+
+        with self.__lock:
+            requests = sorted(self.__requests.items())
+            metric("requests_total", "counter", "Requests sent to the CCP",
+                   [("", [("action", action)], totals["requests"]) for action, totals in requests])
+            metric("request_errors_total", "counter", "Requests failed with network or HTTP errors",
+                   [("", [("action", action)], totals["errors"]) for action, totals in requests])
+            metric("request_connection_retries_total", "counter", "Requests repeated on a new connection",
+                   [("", [("action", action)], totals["retries"]) for action, totals in requests])
+            metric("request_bytes_total", "counter", "Bytes sent, received and after content decoding",
+                   [("", [("action", action), ("direction", direction)], totals[direction])
+                    for action, totals in requests for direction in ("sent", "received", "decoded")])
+            metric("request_phase_seconds_total", "counter", "Seconds spent per request phase",
+                   [("", [("action", action), ("phase", phase)], totals["phases"][phase])
+                    for action, totals in requests for phase in PHASES])
+
+            samples = []
+            for action, totals in requests:
+                count = 0
+                for bound, value in zip(DURATION_BUCKETS + ("+Inf",), totals["buckets"]):
+                    count += value
+                    samples.append(("_bucket", [("action", action), ("le", bound)], count))
+                samples.append(("_sum", [("action", action)], totals["seconds"]))
+                samples.append(("_count", [("action", action)], totals["requests"]))
+            metric("request_duration_seconds", "histogram", "Duration of requests", samples)
+
+            metric("call_retries_total", "counter", "Calls repeated after relogin",
+                   [("", [("call", call)], value) for call, value in sorted(self.__retries.items())])
+            metric("session_events_total", "counter", "Session events",
+                   [("", [("kind", kind)], value) for kind, value in sorted(self.__sessions.items())])
+
+        return "\n".join(lines) + "\n"
+
+
+class CCPStatsdObserver(CCPObserver):
+    """
+    Formats events as statsd lines and passes them to write
+
+    write can be e.g. sys.stdout.write or a function sending to a statsd
+    server, no network is used by the observer itself.
+    """
+
+    def __init__(self, write, prefix="netcup"):
+        """
+        Creates observer calling write(line) for every metric
+        """
+
+        self.__write  = write
+        self.__prefix = prefix
+
+
+    def onRequest(self, event):
+        """
+        Writes counters, byte counts and phase timers of request
+        """
+
+        name = self.__prefix + "." + _statsdName(event["action"])
+        self.__write(name + ".requests:1|c\n")
+        if event["error"]:
+            self.__write(name + ".errors:1|c\n")
+        if event["retries"]:
+            self.__write(name + ".connection_retries:" + str(event["retries"]) + "|c\n")
+
+        for direction in ("sent", "received", "decoded"):
+            self.__write(name + ".bytes_" + direction + ":" + str(event["bytes_" + direction]) + "|c\n")
+        for phase in PHASES + ("total",):
+            self.__write(name + "." + phase + ":" + _number(event[phase] * 1000) + "|ms\n")
+
+
+    def onRetry(self, event):
+        """
+        Writes counter of repeated call
+        """
+
+        self.__write(self.__prefix + ".retries." + _statsdName(event["call"]) + ":1|c\n")
+
+
+    def onSession(self, event):
+        """
+        Writes counter of session event
+        """
+
+        self.__write(self.__prefix + ".session." + _statsdName(event["kind"]) + ":1|c\n")
+
+
+def profileCall(func, *args, output=None, sort="cumulative", limit=30, **kwargs):
+    """
+    Calls func with cProfile and returns its result
+
+    Stats are dumped to file path output or printed to stream output,
+    default is stderr
+    """
+
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(func, *args, **kwargs)
+    finally:
+        if isinstance(output, str):
+            profile.dump_stats(output)
+        else:
+            stats = pstats.Stats(profile, stream=output or sys.stderr)
+            stats.sort_stats(sort).print_stats(limit)
+
+
+def _escape(value):
+    """
+    Escapes Prometheus label value
+    """
+
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _number(value):
+    """
+    Formats number without exponent for small floats
+    """
+
+    if isinstance(value, float):
+        return ("%.6f" % value).rstrip("0").rstrip(".")
+
+    return str(value)
+
+
+def _statsdName(value):
+    """
+    Returns value usable as statsd metric name
+    """
+
+    return "".join(char if char.isalnum() or char in "_-" else "_" for char in value)
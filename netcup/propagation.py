@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Copyright (C) 2018 MrKrabat
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import threading
+
+try:
+    import dns.exception
+    import dns.message
+    import dns.query
+    import dns.rdatatype
+    import dns.resolver
+except ImportError:
+    # dns checks are optional
+    dns = None
+
+
+class CCPPropagationChecker(object):
+    """
+    Checks records directly on the authoritative nameservers
+
+    Requires dnspython, addresses of the nameservers are cached per zone.
+    """
+
+    def __init__(self, timeout=5):
+        """
+        Creates checker using timeout in seconds per query
+        """
+
+        if dns is None:
+            raise ImportError("dnspython is required for dns checks")
+
+        self.__timeout = timeout
+        self.__lock    = threading.Lock()
+        self.__servers = {}
+
+
+    def isLive(self, records):
+        """
+        Returns True if all authoritative nameservers answer all records
+
+        records is an iterable of tuples of fully qualified name, type and
+        destination
+        """
+
+        for name, rr_type, destination in records:
+            try:
+                servers = self.getNameservers(name)
+            except dns.exception.DNSException:
+                return False
+            if not servers:
+                return False
+
+            if rr_type != "TXT":
+                destination = destination.rstrip(".")
+            for server in servers:
+                if not destination in self.__query(name, rr_type, server):
+                    return False
+
+        return True
+
+
+    def getNameservers(self, name):
+        """
+        Returns list of addresses of authoritative nameservers of name
+        """
+
+        zone = dns.resolver.zone_for_name(name)
+        with self.__lock:
+            servers = self.__servers.get(zone)
+        if servers is not None:
+            return servers
+
+        servers = []
+        for ns in dns.resolver.resolve(zone, "NS"):
+            servers.extend(address.to_text() for address in dns.resolver.resolve(ns.target, "A"))
+
+        with self.__lock:
+            self.__servers[zone] = servers
+
+        return servers
+
+
+    def __query(self, name, rr_type, server):
+        """
+        Returns set of destinations of record answered by server
+        """
+
+        query = dns.message.make_query(name, dns.rdatatype.from_text(rr_type))
+        try:
+            response = dns.query.udp(query, server, timeout=self.__timeout)
+        except (dns.exception.DNSException, OSError):
+            return set()
+
+        destinations = set()
+        for rrset in response.answer:
+            for rdata in rrset:
+                if rdata.rdtype == dns.rdatatype.TXT:
+                    destinations.add(b"".join(rdata.strings).decode("utf-8", "replace"))
+                elif rdata.rdtype == dns.rdatatype.MX:
+                    destinations.add(rdata.exchange.to_text().rstrip("."))
+                else:
+                    destinations.add(rdata.to_text().rstrip("."))
+
+        return destinations
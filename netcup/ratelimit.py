@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Copyright (C) 2018 MrKrabat
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import time
+import threading
+from contextlib import contextmanager
+
+try:
+    from exception import *
+except ImportError:
+    from .exception import *
+
+
+# saving zones is limited stricter than reading them
+ACTION_LIMITS = {"editzone":           {"rate": 1.0,  "burst": 2,  "concurrency": 1},
+                 "showdomainsdetails": {"rate": 10.0, "burst": 10, "concurrency": 8},
+                 "listdomains":        {"rate": 20.0, "burst": 20, "concurrency": 8}}
+
+
+class CCPTokenBucket(object):
+    """
+    Token bucket allowing rate requests per second and bursts of burst
+    """
+
+    def __init__(self, rate, burst=None):
+        """
+        Creates full bucket
+        """
+
+        if rate <= 0:
+            raise ValueError("rate has to be positive number")
+
+        self.__rate   = float(rate)
+        self.__burst  = float(burst if burst is not None else max(1.0, rate))
+        self.__tokens = self.__burst
+        self.__last   = time.monotonic()
+        self.__lock   = threading.Lock()
+
+
+    def reserve(self):
+        """
+        Takes one token, returns seconds to wait until it is available
+        """
+
+        with self.__lock:
+            now = time.monotonic()
+            self.__tokens = min(self.__burst, self.__tokens + (now - self.__last) * self.__rate)
+            self.__last = now
+            self.__tokens -= 1
+            if self.__tokens >= 0:
+                return 0.0
+
+            return -self.__tokens / self.__rate
+
+
+    def cancel(self):
+        """
+        Returns reserved token
+        """
+
+        with self.__lock:
+            self.__tokens = min(self.__burst, self.__tokens + 1)
+
+
+class CCPConcurrencyLimit(object):
+    """
+    Adaptive concurrency limit with additive increase, multiplicative decrease
+
+    The limit grows by one after limit successful requests and is
+    multiplied by decrease after an error or a latency above
+    tolerance times the lowest latency seen for the same action, at most
+    once per cooldown.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=16, decrease=0.5, tolerance=3.0, min_latency=0.05, cooldown=1.0):
+        """
+        Creates limit
+        """
+
+        if not 1 <= minimum <= initial <= maximum:
+            raise ValueError("minimum <= initial <= maximum required")
+
+        self.__limit       = float(initial)
+        self.__minimum     = minimum
+        self.__maximum     = maximum
+        self.__decrease    = decrease
+        self.__tolerance   = tolerance
+        self.__min_latency = min_latency
+        self.__cooldown    = cooldown
+        self.__baselines   = {}
+        self.__successes   = 0
+        self.__decreased   = 0.0
+        self.__stats       = {"increases": 0,
+                              "decreases": 0}
+
+
+    def getLimit(self):
+        """
+        Returns current number of allowed parallel requests
+        """
+
+        return int(self.__limit)
+
+
+    def update(self, latency, error=False, action=None):
+        """
+        Adapts limit to result of finished request, requires external lock
+
+        Latencies are only compared with earlier ones of the same action
+        """
+
+        baseline = self.__baselines.get(action)
+        if latency is not None and not error:
+            # lowest latency slowly forgets old values
+            if baseline is None or latency < baseline:
+                baseline = latency
+            else:
+                baseline += (latency - baseline) * 0.01
+            self.__baselines[action] = baseline
+
+        overloaded = error or (latency is not None and baseline is not None and
+                               latency > max(self.__min_latency, baseline * self.__tolerance))
+        if overloaded:
+            now = time.monotonic()
+            if now - self.__decreased >= self.__cooldown:
+                self.__decreased = now
+                self.__limit = max(self.__minimum, self.__limit * self.__decrease)
+                self.__successes = 0
+                self.__stats["decreases"] += 1
+            return
+
+        self.__successes += 1
+        if self.__successes >= self.__limit and self.__limit < self.__maximum:
+            self.__limit = min(self.__maximum, self.__limit + 1)
+            self.__successes = 0
+            self.__stats["increases"] += 1
+
+
+    def getStats(self):
+        """
+        Returns dict containing limit counters
+        """
+
+        return dict(self.__stats, limit=self.getLimit())
+
+
+class CCPRateLimiter(object):
+    """
+    Limits rate and concurrency of CCP requests
+
+    One token bucket and one adaptive concurrency limit are shared by all
+    requests, limits maps action names like "editzone" to dicts of
+    "rate", "burst" and "concurrency" applied additionally per action.
+    Can be shared between connections.
+    """
+
+    def __init__(self, rate=20, burst=None, concurrency=None, limits=None, max_wait=None):
+        """
+        Creates limiter
+
+        concurrency is a CCPConcurrencyLimit, max_wait the seconds a request
+        may wait for a slot before CCPRateLimitError is raised
+        """
+
+        self.__bucket      = CCPTokenBucket(rate, burst)
+        self.__concurrency = concurrency if concurrency is not None else CCPConcurrencyLimit()
+        self.__limits      = dict(ACTION_LIMITS if limits is None else limits)
+        self.__buckets     = {action: CCPTokenBucket(limit["rate"], limit.get("burst"))
+                              for action, limit in self.__limits.items() if limit.get("rate")}
+        self.__max_wait    = max_wait
+        self.__condition   = threading.Condition()
+        self.__inflight    = 0
+        self.__actions     = {}
+        self.__stats       = {"requests":     0,
+                              "waits":        0,
+                              "wait_seconds": 0.0,
+                              "errors":       0}
+
+
+    @contextmanager
+    def request(self, action):
+        """
+        Waits for slot of action, yields dict to set "latency" and "error"
+        """
+
+        result = {"latency": None, "error": False}
+        self.acquire(action)
+        try:
+            yield result
+        except Exception:
+            result["error"] = True
+            raise
+        finally:
+            self.release(action, result["latency"], result["error"])
+
+
+    def acquire(self, action):
+        """
+        Blocks until request of action is allowed
+        """
+
+        start = time.monotonic()
+        deadline = start + self.__max_wait if self.__max_wait is not None else None
+
+        # rate of all requests and of action
+        buckets = [self.__bucket]
+        if action in self.__buckets:
+            buckets.append(self.__buckets[action])
+        delay = max([bucket.reserve() for bucket in buckets])
+        if deadline is not None and start + delay > deadline:
+            for bucket in buckets:
+                bucket.cancel()
+            raise CCPRateLimitError("Rate limit of " + action + " exceeded")
+        if delay:
+            time.sleep(delay)
+
+        # parallel requests of all actions and of action
+        limit = self.__limits.get(action, {}).get("concurrency")
+        with self.__condition:
+            while self.__inflight >= self.__concurrency.getLimit() or (limit and self.__actions.get(action, 0) >= limit):
+                timeout = deadline - time.monotonic() if deadline is not None else None
+                if timeout is not None and timeout <= 0:
+                    raise CCPRateLimitError("Concurrency limit of " + action + " exceeded")
+                self.__condition.wait(timeout)
+
+            self.__inflight += 1
+            self.__actions[action] = self.__actions.get(action, 0) + 1
+            self.__stats["requests"] += 1
+            waited = time.monotonic() - start
+            if waited > 0.001:
+                self.__stats["waits"] += 1
+                self.__stats["wait_seconds"] += waited
+
+
+    def release(self, action, latency=None, error=False):
+        """
+        Frees slot and adapts concurrency to latency in seconds and errors
+        """
+
+        with self.__condition:
+            self.__inflight -= 1
+            self.__actions[action] -= 1
+            if error:
+                self.__stats["errors"] += 1
+            self.__concurrency.update(latency, error, action)
+            self.__condition.notify_all()
+
+
+    def getStats(self):
+        """
+        Returns dict containing limiter counters
+        """
+
+        with self.__condition:
+            stats = dict(self.__stats)
+            stats.update(self.__concurrency.getStats())
+            stats["inflight"] = self.__inflight
+
+        return stats
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Copyright (C) 2018 MrKrabat
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+from collections.abc import Mapping
+
+
+RR_FIELDS = ("host", "type", "pri", "destination")
+
+
+class CCPRecord(Mapping):
+    """
+    Immutable resource record
+
+    Behaves like the read-only dict {"host", "type", "pri", "destination"}
+    with additional key "delete" if record is marked for deletion
+    """
+
+    __slots__ = ("host", "type", "pri", "destination", "delete")
+
+    def __init__(self, host, type, pri, destination, delete=None):
+        """
+        Creates resource record
+        """
+
+        object.__setattr__(self, "host", host)
+        object.__setattr__(self, "type", type)
+        object.__setattr__(self, "pri", pri)
+        object.__setattr__(self, "destination", destination)
+        object.__setattr__(self, "delete", delete)
+
+
+    def replace(self, **kwargs):
+        """
+        Returns new record with changed values
+        """
+
+        values = {"host":        self.host,
+                  "type":        self.type,
+                  "pri":         self.pri,
+                  "destination": self.destination,
+                  "delete":      self.delete}
+        for key, value in kwargs.items():
+            if key not in values:
+                raise TypeError("Unknown record field " + key)
+            values[key] = value
+
+        return CCPRecord(**values)
+
+
+    def __getitem__(self, key):
+        """
+        Returns value of field
+        """
+
+        if key in RR_FIELDS:
+            return getattr(self, key)
+        if key == "delete" and self.delete is not None:
+            return self.delete
+
+        raise KeyError(key)
+
+
+    def __iter__(self):
+        """
+        Iterates over field names
+        """
+
+        yield from RR_FIELDS
+        if self.delete is not None:
+            yield "delete"
+
+
+    def __len__(self):
+        """
+        Returns number of fields
+        """
+
+        return 4 if self.delete is None else 5
+
+
+    def __eq__(self, other):
+        """
+        Compares record with record or dict
+        """
+
+        if isinstance(other, CCPRecord):
+            return (self.host, self.type, self.pri, self.destination, self.delete) == (other.host, other.type, other.pri, other.destination, other.delete)
+
+        return Mapping.__eq__(self, other)
+
+
+    def __hash__(self):
+        """
+        Returns hash of all fields
+        """
+
+        return hash((self.host, self.type, self.pri, self.destination, self.delete))
+
+
+    def __setattr__(self, name, value):
+        """
+        Records are immutable
+        """
+
+        raise AttributeError("CCPRecord is immutable")
+
+
+    def __delattr__(self, name):
+        """
+        Records are immutable
+        """
+
+        raise AttributeError("CCPRecord is immutable")
+
+
+    def __copy__(self):
+        """
+        Immutable records are not copied
+        """
+
+        return self
+
+
+    def __deepcopy__(self, memo):
+        """
+        Immutable records are not copied
+        """
+
+        return self
+
+
+    def __reduce__(self):
+        """
+        Pickle support
+        """
+
+        return (CCPRecord, (self.host, self.type, self.pri, self.destination, self.delete))
+
+
+    def __repr__(self):
+        """
+        Returns record as dict representation
+        """
+
+        return "CCPRecord(" + repr(dict(self)) + ")"
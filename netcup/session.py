@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Copyright (C) 2018 MrKrabat
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import os
+import json
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # no file locking on this platform
+    fcntl = None
+
+
+class CCPSessionStore(object):
+    """
+    Stores cookies and session tokens on disk
+
+    Cookies are saved in cachepath, tokens and the time of the last
+    successful session validation in cachepath + ".session". Files are
+    replaced atomically and access is serialized between threads and
+    processes by an exclusive lock on cachepath + ".lock".
+    """
+
+    def __init__(self, cachepath):
+        """
+        Creates session store for cachepath
+        """
+
+        # check if path is writeable
+        path = os.path.dirname(cachepath)
+        if not path:
+            path = "."
+
+        if not os.access(path, os.W_OK):
+            raise IOError("cachepath is not writeable")
+
+        self.__cachepath = cachepath
+        self.__infopath  = cachepath + ".session"
+        self.__lockpath  = cachepath + ".lock"
+        self.__lock      = threading.RLock()
+        self.__lockfile  = None
+        self.__depth     = 0
+
+
+    @contextmanager
+    def lock(self):
+        """
+        Locks session store exclusively, can be nested
+        """
+
+        with self.__lock:
+            if self.__depth == 0 and fcntl is not None:
+                self.__lockfile = open(self.__lockpath, "a")
+                fcntl.flock(self.__lockfile, fcntl.LOCK_EX)
+
+            try:
+                self.__depth += 1
+                yield self
+            finally:
+                self.__depth -= 1
+                if self.__depth == 0 and self.__lockfile is not None:
+                    fcntl.flock(self.__lockfile, fcntl.LOCK_UN)
+                    self.__lockfile.close()
+                    self.__lockfile = None
+
+
+    def load(self, jar):
+        """
+        Loads cookies into jar, returns dict of session infos
+        """
+
+        with self.lock():
+            # load cookies
+            try:
+                jar.load(self.__cachepath, ignore_discard=True)
+            except IOError:
+                # cookie file does not exist
+                return {}
+
+            return self.loadInfo()
+
+
+    def loadInfo(self):
+        """
+        Returns dict of session infos
+        """
+
+        with self.lock():
+            try:
+                with open(self.__infopath, "r") as f:
+                    info = json.load(f)
+            except (IOError, ValueError):
+                return {}
+
+        return info if isinstance(info, dict) else {}
+
+
+    def save(self, jar, info):
+        """
+        Saves cookies of jar and dict of session infos
+        """
+
+        with self.lock():
+            self.__replace(self.__cachepath, lambda path: jar.save(path, ignore_discard=True))
+            self.__replace(self.__infopath, lambda path: self.__dump(path, info))
+
+        return True
+
+
+    def __dump(self, path, info):
+        """
+        Writes session infos as json
+        """
+
+        with open(path, "w") as f:
+            json.dump(info, f)
+
+
+    def __replace(self, path, write):
+        """
+        Replaces file atomically with file written by write(path)
+        """
+
+        fd, tmppath = tempfile.mkstemp(prefix=os.path.basename(path) + ".", dir=os.path.dirname(path) or ".")
+        os.close(fd)
+        try:
+            write(tmppath)
+            os.replace(tmppath, path)
+        finally:
+            # remove temporary file if not replaced
+            if os.path.exists(tmppath):
+                os.unlink(tmppath)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Copyright (C) 2018 MrKrabat
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+from collections import Counter
+from collections.abc import Mapping
+
+try:
+    from domain import RR_ALLOWED_SET
+    from record import CCPRecord
+except ImportError:
+    from .domain import RR_ALLOWED_SET
+    from .record import CCPRecord
+
+
+def diffRecords(domain_obj, desired_records, managed_types=None):
+    """
+    Returns plan to turn records of domain into desired records
+
+    desired_records is an iterable of dicts or tuples of host, type,
+    destination and optional pri. Only records of managed_types are
+    compared if given. The plan is a dict with list "add" of CCPRecord,
+    dict "remove" of record id and CCPRecord and number "unchanged".
+    """
+
+    # count desired records
+    desired = Counter(_key(record) for record in desired_records)
+    for key in desired:
+        if not key[1] in RR_ALLOWED_SET:
+            raise ValueError("Not supported resource record")
+        if managed_types is not None and not key[1] in managed_types:
+            raise ValueError("Record type " + key[1] + " is not managed")
+
+    # match existing records
+    remove = {}
+    unchanged = 0
+    for rr_id, record in domain_obj.iterRecords():
+        if "delete" in record or (managed_types is not None and not record["type"] in managed_types):
+            continue
+
+        key = (record["host"], record["type"], _pri(record["pri"]), record["destination"])
+        if desired[key] > 0:
+            desired[key] -= 1
+            unchanged += 1
+        else:
+            remove[rr_id] = record
+
+    add = [CCPRecord(host, rr_type, pri, destination) for (host, rr_type, pri, destination), count in desired.items() for _ in range(count)]
+    return {"add": add, "remove": remove, "unchanged": unchanged}
+
+
+def applyPlan(domain_obj, plan):
+    """
+    Applies plan of diffRecords atomically
+    """
+
+    changes = [("remove", {"rr_id": rr_id}) for rr_id in plan["remove"]]
+    changes.extend(("add", {"rr_host": record.host, "rr_type": record.type, "rr_destination": record.destination, "rr_pri": record.pri})
+                   for record in plan["add"])
+
+    return domain_obj.applyChanges(changes)
+
+
+def _key(record):
+    """
+    Returns hashable key of desired record
+    """
+
+    if isinstance(record, Mapping):
+        return (record["host"], record["type"], _pri(record.get("pri")), record["destination"])
+
+    if len(record) == 3:
+        return (record[0], record[1], "0", record[2])
+
+    return (record[0], record[1], _pri(record[3]), record[2])
+
+
+def _pri(pri):
+    """
+    Returns priority as string
+    """
+
+    return str(pri) if pri not in (None, "") else "0"
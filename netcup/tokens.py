@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Copyright (C) 2018 MrKrabat
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import re
+import threading
+
+
+EXPIRED_MARKER = "Your session has expired"
+# double quoted csrf token is preferred over single quoted one
+TOKEN_PATTERNS = (re.compile(r"sessionhash = \"(.*?)\";"),
+                  re.compile(r"nocsrftoken = \"(.*?)\";"),
+                  re.compile(r"nocsrftoken = '(.*?)';"))
+# longest part of a token kept between chunks
+TOKEN_TAIL = 256
+
+
+class CCPTokenScanner(object):
+    """
+    Finds expiry marker, session hash and csrf token in one pass
+
+    Content can be fed in chunks, patterns already found are not searched
+    in later chunks.
+    """
+
+    def __init__(self):
+        """
+        Creates scanner
+        """
+
+        self.__expired = False
+        self.__found   = [None] * len(TOKEN_PATTERNS)
+        self.__tail    = ""
+
+
+    def feed(self, data):
+        """
+        Scans next chunk of content
+        """
+
+        # tokens can be split between chunks
+        data = self.__tail + data
+        self.__tail = data[-TOKEN_TAIL:]
+
+        if not self.__expired and EXPIRED_MARKER in data:
+            self.__expired = True
+
+        for i, pattern in enumerate(TOKEN_PATTERNS):
+            # single quoted token is not needed after double quoted one
+            if self.__found[i] is None and not (i == 2 and self.__found[1] is not None):
+                match = pattern.search(data)
+                if match:
+                    self.__found[i] = match.group(1)
+
+
+    def getTokens(self):
+        """
+        Returns tuple of expired state, session hash and csrf token
+        """
+
+        sessionhash, nocsrftoken, nocsrftoken_single = self.__found
+        return self.__expired, sessionhash, nocsrftoken if nocsrftoken is not None else nocsrftoken_single
+
+
+class CCPTokenStore(object):
+    """
+    Thread-safe storage of session hash and csrf token
+
+    Tracks whether the server rotates the csrf token, responses without
+    token only require a new one if the server was seen rotating it.
+    """
+
+    def __init__(self):
+        """
+        Creates empty token store
+        """
+
+        self.__lock        = threading.Lock()
+        self.__refreshlock = threading.Lock()
+        self.__ticket      = 0
+        self.__applied     = 0
+        self.__sessionhash = None
+        self.__nocsrftoken = None
+        self.__rotating    = True
+        self.__generation  = 0
+        self.__stats       = {"refreshes":         0,
+                              "refreshes_avoided": 0,
+                              "rotations":         0}
+
+
+    def get(self):
+        """
+        Returns tuple of request ticket, session hash and csrf token
+        """
+
+        with self.__lock:
+            self.__ticket += 1
+            return self.__ticket, self.__sessionhash, self.__nocsrftoken
+
+
+    def getSessionHash(self):
+        """
+        Returns session hash
+        """
+
+        with self.__lock:
+            return self.__sessionhash
+
+
+    def getCSRFToken(self):
+        """
+        Returns csrf token
+        """
+
+        with self.__lock:
+            return self.__nocsrftoken
+
+
+    def update(self, ticket=None, sessionhash=None, nocsrftoken=None):
+        """
+        Stores tokens found in response of request with ticket
+
+        Tokens of responses older than the last applied one are dropped
+        """
+
+        with self.__lock:
+            if ticket is not None:
+                if ticket < self.__applied:
+                    return False
+                self.__applied = ticket
+
+            if nocsrftoken is not None:
+                # same session with other token
+                if sessionhash in (None, self.__sessionhash) and self.__nocsrftoken is not None:
+                    self.__rotated(nocsrftoken)
+                self.__nocsrftoken = nocsrftoken
+            if sessionhash is not None:
+                self.__sessionhash = sessionhash
+
+        return True
+
+
+    def refresh(self, fetch, force=True):
+        """
+        Requests new csrf token using fetch(sessionhash)
+
+        Only one thread fetches a new token, threads calling refresh at the
+        same time wait and use its result. Without force the token is kept
+        unless the server was seen rotating it.
+        """
+
+        with self.__lock:
+            generation = self.__generation
+            if not force and self.__nocsrftoken is not None and not self.__rotating:
+                self.__stats["refreshes_avoided"] += 1
+                return False
+
+        with self.__refreshlock:
+            # token already refreshed by other thread, even if it is unchanged
+            if self.__generation != generation:
+                return False
+
+            token = fetch(self.getSessionHash())
+            with self.__lock:
+                self.__stats["refreshes"] += 1
+                if self.__nocsrftoken is not None:
+                    self.__rotated(token)
+                self.__nocsrftoken = token
+                self.__generation += 1
+
+        return True
+
+
+    def getStats(self):
+        """
+        Returns dict containing token counters
+        """
+
+        with self.__lock:
+            return dict(self.__stats)
+
+
+    def clear(self):
+        """
+        Removes all tokens
+        """
+
+        with self.__lock:
+            self.__sessionhash = None
+            self.__nocsrftoken = None
+
+
+    def __rotated(self, nocsrftoken):
+        """
+        Remembers if new token of same session differs, requires lock
+        """
+
+        self.__rotating = nocsrftoken != self.__nocsrftoken
+        if self.__rotating:
+            self.__stats["rotations"] += 1
@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Copyright (C) 2018 MrKrabat
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import ssl
+import time
+import zlib
+import base64
+import select
+import threading
+from io import BytesIO
+from urllib.parse import urlsplit, urljoin, unquote
+from urllib.request import Request, getproxies, proxy_bypass_environment
+from urllib.error import HTTPError, URLError
+from http.client import HTTPConnection, HTTPSConnection, HTTPException
+
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+CONTENT_ENCODINGS = ("gzip", "x-gzip", "deflate", "identity")
+
+
+class CCPDecoder(object):
+    """
+    Incremental decoder of gzip, deflate or identity content encoding
+    """
+
+    def __init__(self, encoding=None):
+        """
+        Creates decoder for value of Content-Encoding header
+        """
+
+        encoding = (encoding or "identity").strip().lower()
+        if not encoding in CONTENT_ENCODINGS:
+            raise URLError("Unsupported content encoding " + encoding)
+
+        self.__encoding = encoding
+        self.__head     = b""
+        self.__decoder  = zlib.decompressobj(16 + zlib.MAX_WBITS) if encoding in ("gzip", "x-gzip") else None
+
+
+    def decompress(self, data):
+        """
+        Returns decoded part of data
+        """
+
+        if self.__encoding == "identity" or not data:
+            return data
+
+        # deflate is sent with or without zlib header
+        if self.__decoder is None:
+            data = self.__head + data
+            if len(data) < 2:
+                self.__head = data
+                return b""
+            zlib_header = len(data) >= 2 and data[0] & 0x0f == 8 and (data[0] << 8 | data[1]) % 31 == 0
+            self.__decoder = zlib.decompressobj(zlib.MAX_WBITS if zlib_header else -zlib.MAX_WBITS)
+
+        try:
+            return self.__decoder.decompress(data)
+        except zlib.error as e:
+            raise URLError(e)
+
+
+    def flush(self):
+        """
+        Returns remaining decoded data
+        """
+
+        if self.__decoder is None:
+            return b""
+
+        return self.__decoder.flush()
+
+
+class CCPResponse(object):
+    """
+    HTTP response streaming its body
+
+    The connection is returned to the pool after the body was read
+    completely, a response closed early closes its connection. metrics
+    holds the phase timings in seconds and byte counts of the request.
+    """
+
+    def __init__(self, url, status, reason, headers, raw, release, metrics=None):
+        """
+        Creates response object
+        """
+
+        self.url       = url
+        self.status    = status
+        self.reason    = reason
+        self.headers   = headers
+        self.__raw     = raw
+        self.__release = release
+        self.__body    = None
+        self.metrics   = {"connect":  0.0,
+                          "ttfb":     0.0,
+                          "transfer": 0.0,
+                          "decode":   0.0,
+                          "retries":  0,
+                          "received": 0,
+                          "decoded":  0}
+        self.metrics.update(metrics or {})
+
+
+    def read(self):
+        """
+        Returns raw response body
+        """
+
+        if self.__body is None:
+            self.__body = b"".join(self.__iterRaw())
+
+        return self.__body
+
+
+    def iterContent(self, chunk_size=65536):
+        """
+        Yields chunks of body decoded according to Content-Encoding
+        """
+
+        metrics = self.metrics
+        decoder = CCPDecoder(self.headers.get("Content-Encoding"))
+        chunks = [self.__body] if self.__body is not None else self.__iterRaw(chunk_size)
+        for chunk in chunks:
+            start = time.perf_counter()
+            data = decoder.decompress(chunk)
+            metrics["decode"] += time.perf_counter() - start
+            if data:
+                metrics["decoded"] += len(data)
+                yield data
+
+        data = decoder.flush()
+        if data:
+            metrics["decoded"] += len(data)
+            yield data
+
+
+    def close(self):
+        """
+        Closes connection if body was not read completely
+        """
+
+        if self.__release is not None:
+            self.__finish(False)
+
+
+    def __iterRaw(self, chunk_size=65536):
+        """
+        Yields chunks of raw body and releases connection at the end
+        """
+
+        if self.__release is None:
+            return
+
+        metrics = self.metrics
+        done = False
+        try:
+            while True:
+                start = time.perf_counter()
+                chunk = self.__raw.read(chunk_size)
+                metrics["transfer"] += time.perf_counter() - start
+                if not chunk:
+                    break
+                metrics["received"] += len(chunk)
+                yield chunk
+            done = True
+        finally:
+            self.__finish(done)
+
+
+    def __finish(self, done):
+        """
+        Releases or closes connection once
+        """
+
+        release = self.__release
+        self.__release = None
+        if release is not None:
+            release(done)
+
+
+    def info(self):
+        """
+        Returns response headers
+        """
+
+        return self.headers
+
+
+    def geturl(self):
+        """
+        Returns url of response
+        """
+
+        return self.url
+
+
+class CCPTransport(object):
+    """
+    HTTP/1.1 transport keeping connections alive between requests
+    """
+
+    def __init__(self, pool_size=4, idle_timeout=60, timeout=30, max_redirects=10, proxies=None):
+        """
+        Creates transport with connection pool
+
+        proxies maps schemes to proxy urls like urllib's ProxyHandler,
+        default are the http_proxy, https_proxy and no_proxy environment
+        variables. https is tunneled with CONNECT, proxies are connected
+        without TLS.
+        """
+
+        self.pool_size     = int(pool_size)
+        self.idle_timeout  = float(idle_timeout)
+        self.timeout       = timeout
+        self.max_redirects = int(max_redirects)
+        self.addheaders    = []
+        self.proxies       = getproxies() if proxies is None else dict(proxies)
+
+        self.__context = ssl.create_default_context()
+        self.__lock    = threading.Lock()
+        self.__pool    = {}
+        self.__stats   = {"requests":           0,
+                          "connections_new":    0,
+                          "connections_reused": 0,
+                          "connections_closed": 0}
+
+
+    def open(self, url, data=None, jar=None):
+        """
+        Sends request and follows redirects, returns CCPResponse
+
+        The body of the response has to be read or the response closed
+        """
+
+        for _ in range(self.max_redirects + 1):
+            request = Request(url, data=data, headers=dict(self.addheaders))
+            if data is not None:
+                request.add_header("Content-Type", "application/x-www-form-urlencoded")
+            if jar is not None:
+                jar.add_cookie_header(request)
+
+            response = self.__send(request)
+            if jar is not None:
+                jar.extract_cookies(response, request)
+
+            # follow redirect
+            location = response.headers.get("Location")
+            if response.status in REDIRECT_CODES and location:
+                response.read()
+                url = urljoin(url, location)
+                if response.status in (301, 302, 303):
+                    data = None
+                continue
+
+            # raise same exception as urllib
+            if response.status >= 400:
+                raise HTTPError(url, response.status, response.reason, response.headers, BytesIO(response.read()))
+
+            return response
+
+        raise URLError("Too many redirects")
+
+
+    def close(self):
+        """
+        Closes all idle connections
+        """
+
+        with self.__lock:
+            pool = self.__pool
+            self.__pool = {}
+
+        for connections in pool.values():
+            for connection, _ in connections:
+                self.__close(connection)
+
+
+    def getStats(self):
+        """
+        Returns dict containing connection counters
+        """
+
+        with self.__lock:
+            return dict(self.__stats)
+
+
+    def __send(self, request):
+        """
+        Sends request over pooled connection
+        """
+
+        parts = urlsplit(request.full_url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = (parts.path or "/") + ("?" + parts.query if parts.query else "")
+
+        headers = dict(request.header_items())
+        headers["Connection"] = "keep-alive"
+
+        # plain http proxies get the absolute url
+        proxy = self.__getProxy(parts.scheme, parts.hostname)
+        if proxy is not None and parts.scheme == "http":
+            path = request.full_url
+            if proxy[2]:
+                headers["Proxy-Authorization"] = proxy[2]
+
+        retries = 0
+        while True:
+            connection, reused = self.__acquire(key)
+            metrics = {"retries": retries}
+            try:
+                start = time.perf_counter()
+                if not reused:
+                    connection.connect()
+                    metrics["connect"] = time.perf_counter() - start
+                    start = time.perf_counter()
+
+                connection.request(request.get_method(), path, body=request.data, headers=headers)
+                raw = connection.getresponse()
+                metrics["ttfb"] = time.perf_counter() - start
+            except (ConnectionError, HTTPException) as e:
+                self.__close(connection)
+                # server closed idle connection, retry on new connection
+                # unless posted data may already have been processed
+                if reused and request.data is None:
+                    retries += 1
+                    continue
+                if isinstance(e, HTTPException):
+                    raise URLError(e)
+                raise
+            except Exception:
+                self.__close(connection)
+                raise
+
+            # release connection after body was read
+            def release(done):
+                if done and not raw.will_close:
+                    self.__release(key, connection)
+                else:
+                    self.__close(connection)
+
+            return CCPResponse(request.full_url, raw.status, raw.reason, raw.msg, raw, release, metrics)
+
+
+    def __acquire(self, key):
+        """
+        Returns idle connection or creates new one
+        """
+
+        now = time.monotonic()
+        with self.__lock:
+            self.__stats["requests"] += 1
+            connections = self.__pool.get(key, [])
+            while connections:
+                connection, last_used = connections.pop()
+                if now - last_used <= self.idle_timeout and not self.__isDropped(connection):
+                    self.__stats["connections_reused"] += 1
+                    return connection, True
+
+                # idle timeout reached or closed by server
+                self.__stats["connections_closed"] += 1
+                connection.close()
+
+            self.__stats["connections_new"] += 1
+
+        scheme, host, port = key
+        proxy = self.__getProxy(scheme, host)
+        if proxy is None:
+            if scheme == "https":
+                return HTTPSConnection(host, port, timeout=self.timeout, context=self.__context), False
+            return HTTPConnection(host, port, timeout=self.timeout), False
+
+        if scheme == "https":
+            connection = HTTPSConnection(proxy[0], proxy[1], timeout=self.timeout, context=self.__context)
+            connection.set_tunnel(host, port, headers={"Proxy-Authorization": proxy[2]} if proxy[2] else None)
+            return connection, False
+        return HTTPConnection(proxy[0], proxy[1], timeout=self.timeout), False
+
+
+    def __isDropped(self, connection):
+        """
+        Returns True if idle connection was closed by the server
+
+        An idle connection is only readable if the server closed it or sent
+        unexpected data, both make it unusable.
+        """
+
+        if connection.sock is None:
+            return True
+
+        try:
+            readable, _, _ = select.select([connection.sock], [], [], 0)
+        except (OSError, ValueError):
+            return True
+
+        return bool(readable)
+
+
+    def __getProxy(self, scheme, host):
+        """
+        Returns tuple of host, port and authorization of proxy or None
+        """
+
+        proxy = self.proxies.get(scheme)
+        if not proxy or proxy_bypass_environment(host, self.proxies):
+            return None
+
+        if not "://" in proxy:
+            proxy = "http://" + proxy
+        parts = urlsplit(proxy)
+
+        authorization = None
+        if parts.username is not None:
+            credentials = unquote(parts.username) + ":" + unquote(parts.password or "")
+            authorization = "Basic " + base64.b64encode(credentials.encode("utf-8")).decode("ascii")
+
+        return parts.hostname, parts.port or 80, authorization
+
+
+    def __release(self, key, connection):
+        """
+        Puts connection back into pool
+        """
+
+        with self.__lock:
+            connections = self.__pool.setdefault(key, [])
+            if len(connections) < self.pool_size:
+                connections.append((connection, time.monotonic()))
+                return
+
+        self.__close(connection)
+
+
+    def __close(self, connection):
+        """
+        Closes connection
+        """
+
+        with self.__lock:
+            self.__stats["connections_closed"] += 1
+        connection.close()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Copyright (C) 2018 MrKrabat
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+try:
+    from exception import *
+except ImportError:
+    from .exception import *
+
+logger = logging.getLogger(__name__)
+
+
+class CCPWriteQueue(object):
+    """
+    Collects changes per zone and saves each zone once per interval
+
+    Every change is applied to a freshly requested domain right before
+    the save, changes submitted within the interval share one request.
+    If a save fails and the zone has a new serial meanwhile, all changes
+    are applied again to the new zone, other failures are passed to the
+    futures.
+    """
+
+    def __init__(self, connection, interval=1.0, batch_size=50, max_conflicts=3, max_workers=4, minimal=False):
+        """
+        Creates queue using logged in CCPConnection
+
+        A zone is saved interval seconds after its first pending change or
+        as soon as batch_size changes are pending. minimal sends only
+        changed records instead of the whole zone.
+        """
+
+        self.__ccp           = connection
+        self.__interval      = interval
+        self.__batch_size    = batch_size
+        self.__max_conflicts = max_conflicts
+        self.__max_workers   = max_workers
+        self.__minimal       = minimal
+        self.__lock          = threading.Lock()
+        self.__wakeup        = threading.Event()
+        self.__pending       = {}
+        self.__saving        = set()
+        self.__thread        = None
+        self.__stats         = {"submitted": 0,
+                                "saves":     0,
+                                "conflicts": 0,
+                                "errors":    0}
+
+
+    def submit(self, domain_id, change):
+        """
+        Queues change of domain, returns Future of its result
+
+        change is a callable getting the CCPDomain or a list of changes of
+        applyChanges. The Future is done after the zone was saved, a change
+        raising an exception is rolled back without affecting the others.
+        """
+
+        if not callable(change):
+            changes = list(change)
+            change = lambda domain_obj: domain_obj.applyChanges(changes)
+
+        future = Future()
+        with self.__lock:
+            pending = self.__pending.setdefault(str(domain_id), (time.monotonic(), []))
+            pending[1].append((change, future))
+            self.__stats["submitted"] += 1
+
+            # new zone or full batch changes next flush
+            if len(pending[1]) == 1 or len(pending[1]) >= self.__batch_size:
+                self.__wakeup.set()
+
+        return future
+
+
+    def flush(self, force=False):
+        """
+        Saves zones which are due, returns number of saves
+
+        force saves all pending zones except zones currently being saved,
+        their changes are saved by the next flush.
+        """
+
+        now = time.monotonic()
+        with self.__lock:
+            due = [domain_id for domain_id, (first, changes) in self.__pending.items()
+                   if not domain_id in self.__saving
+                   and (force or now - first >= self.__interval or len(changes) >= self.__batch_size)]
+            zones = {domain_id: self.__pending.pop(domain_id)[1] for domain_id in due}
+            self.__saving.update(zones)
+
+        # skip changes cancelled by the caller
+        for domain_id in list(zones):
+            zones[domain_id] = [(change, future) for change, future in zones[domain_id] if future.set_running_or_notify_cancel()]
+
+        def save(domain_id):
+            try:
+                return self.__save(domain_id, zones[domain_id])
+            finally:
+                with self.__lock:
+                    self.__saving.discard(domain_id)
+
+        if not zones:
+            return 0
+
+        with ThreadPoolExecutor(max_workers=min(self.__max_workers, len(zones))) as executor:
+            saves = sum(executor.map(save, zones))
+
+        with self.__lock:
+            self.__stats["saves"] += saves
+
+        return saves
+
+
+    def start(self):
+        """
+        Runs queue in background thread
+        """
+
+        self.stop()
+        stop = threading.Event()
+        thread = threading.Thread(target=self.__run, args=(stop,), daemon=True)
+        self.__thread = (stop, thread)
+        thread.start()
+        return True
+
+
+    def stop(self):
+        """
+        Stops background thread and saves pending changes
+        """
+
+        if self.__thread is None:
+            return False
+
+        stop, thread = self.__thread
+        self.__thread = None
+        stop.set()
+        self.__wakeup.set()
+        thread.join()
+        self.flush(force=True)
+        return True
+
+
+    def getStats(self):
+        """
+        Returns dict containing queue counters
+        """
+
+        with self.__lock:
+            stats = dict(self.__stats)
+            stats["pending"] = sum(len(changes) for _, changes in self.__pending.values())
+
+        return stats
+
+
+    def __run(self, stop):
+        """
+        Saves due zones until stop is set
+        """
+
+        while not stop.is_set():
+            self.__wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                # keep queue running
+                logger.exception("Flushing write queue failed")
+
+            # wake up for next zone or full batch
+            with self.__lock:
+                due = [first + self.__interval for domain_id, (first, _) in self.__pending.items()
+                       if not domain_id in self.__saving]
+            timeout = max(0, min(due) - time.monotonic()) if due else None
+            self.__wakeup.wait(timeout)
+
+
+    def __save(self, domain_id, changes):
+        """
+        Applies changes to domain and saves it, returns True if zone was saved
+
+        Results and exceptions are passed to the futures of the changes.
+        """
+
+        conflicts = 0
+        domain_obj = None
+        while changes:
+            try:
+                if domain_obj is None:
+                    domain_obj = self.__ccp.getDomain(domain_id)
+                serial = domain_obj.getDomainSerial()
+                results = []
+                for change, future in changes:
+                    try:
+                        with domain_obj.batch():
+                            results.append((future, change(domain_obj)))
+                    except Exception as e:
+                        # only this change is rolled back
+                        future.set_exception(e)
+
+                saved = domain_obj.hasChanged()
+                if saved:
+                    self.__ccp.saveDomain(domain_obj, minimal=self.__minimal)
+            except CCPSaveDomainError as e:
+                error = e
+                try:
+                    domain_obj = self.__ccp.getDomain(domain_id)
+                except Exception:
+                    domain_obj = None
+
+                # only a new serial is a conflict, otherwise the zone was rejected
+                if domain_obj is not None and domain_obj.getDomainSerial() != serial and conflicts < self.__max_conflicts:
+                    with self.__lock:
+                        self.__stats["conflicts"] += 1
+                    conflicts += 1
+                    changes = [(change, future) for change, future in changes if not future.done()]
+                    continue
+            except Exception as e:
+                # e.g. unsupported records while parsing the zone
+                error = e
+            else:
+                for future, result in results:
+                    future.set_result(result)
+                return saved
+
+            with self.__lock:
+                self.__stats["errors"] += 1
+            for change, future in changes:
+                if not future.done():
+                    future.set_exception(error)
+            return False
+
+        return False
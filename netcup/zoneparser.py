@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# coding: utf8
+
+# Copyright (C) 2018 MrKrabat
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import re
+from html import unescape
+from bs4 import BeautifulSoup
+
+try:
+    from domain import CCPDomain
+    from exception import *
+except ImportError:
+    from .domain import CCPDomain
+    from .exception import *
+
+
+PARSERS = ("bs4", "stream")
+# options without selected attribute are skipped by the regex engine
+TAG_RE  = re.compile(r"""<(?!/option\s*>|option\b(?![^>]*selected))(/?)([a-zA-Z][a-zA-Z0-9]*)((?:[^>"']|"[^"]*"|'[^']*')*)>""")
+SERIAL_RE = re.compile(r"""<input[^>]*?name=["']serial["'][^>]*>""")
+ATTR_RE = re.compile(r"""([^\s=/>"']+)(\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]*)))?""")
+
+
+def parseDomain(content, domain_id, parser="bs4"):
+    """
+    Returns Domain object parsed from showdomainsdetails page
+    """
+
+    if parser == "bs4":
+        return _parseDomainBS4(content, domain_id)
+    elif parser == "stream":
+        zone = CCPZoneParser(domain_id)
+        zone.feed(content)
+        return zone.getDomain()
+    else:
+        raise ValueError("Unknown parser, use one of " + ", ".join(PARSERS))
+
+
+def parseSerial(content):
+    """
+    Returns domain serial of page without parsing the zone
+    """
+
+    match = SERIAL_RE.search(content)
+    if not match:
+        return None
+
+    return _attributes(match.group(0)[6:-1]).get("value")
+
+
+def _parseDomainBS4(content, domain_id):
+    """
+    Parses domain using BeautifulSoup
+    """
+
+    # parse html
+    soup = BeautifulSoup(content, "html.parser")
+    div = soup.find("div", {"id": "domainsdetail_detail_dns_" + str(domain_id)})
+    if not div:
+        raise CCPWebsiteChanges("Could not get DNS tab")
+
+    table = div.find_all("table")
+    if len(table) < 2:
+        raise CCPWebsiteChanges("Could not get RR table")
+
+    # create CCPDomain object
+    try:
+        webhosting = True if "restoredefaultslabel_" + str(domain_id) in str(div) else False
+        dnssec = True if "checked" in str(div.find("input", {"id": "dnssecenabled_" + str(domain_id)})) else None
+        domain_obj = CCPDomain(domain_id         = domain_id,
+                               domain_name       = div.find("input", {"name": "zone"}).get("value"),
+                               domain_zone       = div.find("input", {"name": "zoneid"}).get("value"),
+                               domain_serial     = div.find("input", {"name": "serial"}).get("value"),
+                               domain_dnssec     = dnssec,
+                               domain_webhosting = webhosting,
+                               domain_ttl        = div.find("input", {"name": "zone_settings_ttl_" + str(domain_id)}).get("value"),
+                               domain_retry      = div.find("input", {"name": "zone_settings_retry_" + str(domain_id)}).get("value"),
+                               domain_expire     = div.find("input", {"name": "zone_settings_expire_" + str(domain_id)}).get("value"),
+                               domain_refresh    = div.find("input", {"name": "zone_settings_refresh_" + str(domain_id)}).get("value"))
+    except (AttributeError, TypeError) as e:
+        raise CCPWebsiteChanges("Could not get domain infos")
+
+    # for every dns entry
+    del_lines = -2 if not webhosting else -4
+    for row in table[-2].find_all("tr")[1:del_lines]:
+        column = row.find_all("td")
+
+        # get values
+        try:
+            rr_host = column[0].input.get("value")
+            rr_pri = column[2].input.get("value")
+            rr_destination = column[3].input.get("value")
+            rr_type = ""
+
+            for option in column[1].find_all("option"):
+                if option.get("selected"):
+                    rr_type = option.get("value")
+                    break
+        except (AttributeError, TypeError, IndexError, KeyError) as e:
+            raise CCPWebsiteChanges("Could not get RR row")
+
+        # if record contain values
+        if rr_host:
+            domain_obj.addRecord(rr_host, rr_type, rr_destination, rr_pri, column[0].input.get("name")[:-6])
+
+    domain_obj.clearChanges()
+    return domain_obj
+
+
+def _attributes(text):
+    """
+    Returns dict of tag attributes, valueless attributes are None
+    """
+
+    attrs = {}
+    for name, assignment, double, single, bare in ATTR_RE.findall(text):
+        name = name.lower()
+        if name in attrs:
+            continue
+        if not assignment:
+            attrs[name] = None
+            continue
+        value = double or single or bare
+        attrs[name] = unescape(value) if "&" in value else value
+
+    return attrs
+
+
+class CCPZoneParser(object):
+    """
+    Single pass parser of the DNS tab of showdomainsdetails
+
+    Uses a regex tokenizer and only parses attributes of inputs, selected
+    options and the DNS tab div. Content can be fed in chunks while it is
+    downloaded.
+    """
+
+    def __init__(self, domain_id):
+        """
+        Creates parser for domain id
+        """
+
+        self.__id         = str(domain_id)
+        self.__divid      = "domainsdetail_detail_dns_" + self.__id
+        self.__marker     = "restoredefaultslabel_" + self.__id
+        self.__dnssecid   = "dnssecenabled_" + self.__id
+        self.__buffer     = ""
+        self.__depth      = 0
+        self.__found      = False
+        self.__inputs     = {}
+        self.__dnssec     = None
+        self.__webhosting = False
+        self.__tables     = []
+        self.__open       = []
+        self.__row        = None
+        self.__cell       = None
+
+
+    def feed(self, data):
+        """
+        Parses next chunk of content
+        """
+
+        data = self.__buffer + data
+
+        # keep incomplete tag for next chunk
+        pos = data.rfind("<")
+        if pos != -1 and data.find(">", pos) == -1:
+            self.__buffer = data[pos:]
+            data = data[:pos]
+        else:
+            self.__buffer = ""
+
+        self.__parse(data)
+
+
+    def close(self):
+        """
+        Parses remaining content
+        """
+
+        data = self.__buffer
+        self.__buffer = ""
+        self.__parse(data)
+
+
+    def __parse(self, data):
+        """
+        Processes all complete tags of data
+        """
+
+        # position of webhosting marker in text and attributes of DNS tab
+        marker = data.find(self.__marker) if self.__depth and not self.__webhosting else -1
+
+        for match in TAG_RE.finditer(data):
+            closing, tag, attrs = match.groups()
+            tag = tag.lower()
+
+            if marker != -1 and self.__depth and marker < match.end():
+                self.__webhosting = True
+                marker = -1
+
+            if tag == "option":
+                if self.__depth and self.__cell is not None and self.__cell[1] is None and "selected" in attrs and not closing:
+                    attrs = _attributes(attrs)
+                    if attrs.get("selected"):
+                        self.__cell[1] = attrs.get("value")
+            elif closing:
+                self.__endtag(tag)
+            elif tag == "div":
+                if self.__depth:
+                    self.__depth += 1
+                elif self.__divid in attrs and _attributes(attrs).get("id") == self.__divid:
+                    self.__depth = 1
+                    self.__found = True
+                    if not self.__webhosting:
+                        marker = data.find(self.__marker, match.end())
+            elif not self.__depth:
+                # ignore everything outside of DNS tab
+                continue
+            elif tag == "input":
+                attrs = _attributes(attrs)
+                name = attrs.get("name")
+                if name is not None and name not in self.__inputs:
+                    self.__inputs[name] = attrs.get("value")
+                if self.__dnssec is None and attrs.get("id") == self.__dnssecid:
+                    self.__dnssec = "checked" in attrs or "checked" in "".join(value for value in attrs.values() if value)
+                # first input of cell
+                if self.__cell is not None and self.__cell[0] is None:
+                    self.__cell[0] = attrs
+            elif tag == "td":
+                if self.__row is not None:
+                    self.__cell = [None, None]
+                    self.__row.append(self.__cell)
+            elif tag == "tr":
+                self.__row = []
+                self.__cell = None
+                for index in self.__open:
+                    self.__tables[index].append(self.__row)
+            elif tag == "table":
+                self.__open.append(len(self.__tables))
+                self.__tables.append([])
+
+
+    def __endtag(self, tag):
+        """
+        Tracks end of DNS tab, tables and rows
+        """
+
+        if not self.__depth:
+            return
+
+        if tag == "div":
+            self.__depth -= 1
+        elif tag == "table" and self.__open:
+            self.__open.pop()
+            self.__row = None
+            self.__cell = None
+        elif tag == "tr":
+            self.__row = None
+            self.__cell = None
+        elif tag == "td":
+            self.__cell = None
+
+
+    def getSerial(self):
+        """
+        Returns domain serial or None if it was not parsed yet
+        """
+
+        return self.__inputs.get("serial")
+
+
+    def getDomain(self):
+        """
+        Returns Domain object of parsed content
+        """
+
+        self.close()
+        if not self.__found:
+            raise CCPWebsiteChanges("Could not get DNS tab")
+        if len(self.__tables) < 2:
+            raise CCPWebsiteChanges("Could not get RR table")
+
+        # create CCPDomain object
+        try:
+            inputs = self.__inputs
+            domain_obj = CCPDomain(domain_id         = self.__id,
+                                   domain_name       = inputs["zone"],
+                                   domain_zone       = inputs["zoneid"],
+                                   domain_serial     = inputs["serial"],
+                                   domain_dnssec     = True if self.__dnssec else None,
+                                   domain_webhosting = self.__webhosting,
+                                   domain_ttl        = inputs["zone_settings_ttl_" + self.__id],
+                                   domain_retry      = inputs["zone_settings_retry_" + self.__id],
+                                   domain_expire     = inputs["zone_settings_expire_" + self.__id],
+                                   domain_refresh    = inputs["zone_settings_refresh_" + self.__id])
+        except (KeyError, TypeError) as e:
+            raise CCPWebsiteChanges("Could not get domain infos")
+
+        # for every dns entry
+        del_lines = -2 if not self.__webhosting else -4
+        for row in self.__tables[-2][1:del_lines]:
+            try:
+                host, pri, destination = row[0][0], row[2][0], row[3][0]
+                rr_host = host.get("value")
+                rr_pri = pri.get("value")
+                rr_destination = destination.get("value")
+                rr_type = row[1][1] or ""
+            except (AttributeError, TypeError, IndexError) as e:
+                raise CCPWebsiteChanges("Could not get RR row")
+
+            # if record contain values
+            if rr_host:
+                domain_obj.addRecord(rr_host, rr_type, rr_destination, rr_pri, host.get("name")[:-6])
+
+        domain_obj.clearChanges()
+        return domain_obj